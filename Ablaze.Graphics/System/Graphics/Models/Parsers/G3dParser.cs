@@ -8,6 +8,27 @@ namespace System.Graphics.Models.Parsers {
 	/// <summary>
 	/// Contains methods for parsing and saving G3D models
 	/// </summary>
+	/// <remarks>
+	/// Only version 4 is parsed and saved here. The Blender add-on can also write version 5, which has the same model header, mesh header
+	/// and texture names as version 4. After the texture names of every mesh a version 5 loader reads:
+	/// <list type="bullet">
+	/// <item><description>uint extensionSize, then extensionSize bytes of chunks (byte tag[4], uint size, size bytes of data). Unknown tags must be skipped.</description></item>
+	/// <item><description>uint encoding: 0 means the vertices, normals, texture coordinates and indices follow exactly as in version 4, 1 means they are compressed as below.</description></item>
+	/// </list>
+	/// The compressed mesh data is:
+	/// <list type="number">
+	/// <item><description>float boxMin[3], float boxSize[3]: the bounding box of all the frames of the mesh.</description></item>
+	/// <item><description>float firstFrame[vertexCount * 3]: the vertices of frame 0, uncompressed.</description></item>
+	/// <item><description>uint vertexDeltaSize, then a zlib stream (RFC 1950, DeflateStream after skipping its 2 byte header) holding frames 1 to frameCount - 1.
+	/// Each coordinate is a ushort q, stored as the difference to the q of the same coordinate in the previous frame modulo 65536, where frame 1 is relative to 0.
+	/// The vertexCount * 3 values of a frame are stored as their low bytes followed by their high bytes.
+	/// A coordinate decodes to boxMin + q * boxSize / 65535.</description></item>
+	/// <item><description>uint normalSize, then a zlib stream of the normals of all the frames as octahedral ushort pairs (u, v), delta coded and split in byte planes like the vertices,
+	/// frame 0 being relative to 0. With x = u / 65535 * 2 - 1, y = v / 65535 * 2 - 1 and z = 1 - |x| - |y|, when z &lt; 0 then x, y = ((1 - |y|) * sign(x), (1 - |x|) * sign(y))
+	/// where sign(0) = 1, and the normal is (x, y, z) normalized.</description></item>
+	/// <item><description>The texture coordinates and indices, as in version 4.</description></item>
+	/// </list>
+	/// </remarks>
 	[ModelParser("g3d,Parse,Save")]
 	public static class G3dParser {
 		/// <summary>
@@ -89,7 +110,8 @@ namespace System.Graphics.Models.Parsers {
 				MeshPropertyFlag properties; //specifies property flags for the mesh
 				MeshTexture associatedTextures; //specifies which textures are used by the mesh
 				TextureCollection diffuseTexture; //the texture used by the model
-				int vertex, frame, index;
+				uint unreadSlots; //the texture flags whose 64 byte slots are still to be skipped
+				int vertex, frame, index, skipSlots;
 				Vertex[][] bufferData;
 				Vertex[] frameBufferData, coords;
 				uint[] indices;
@@ -106,8 +128,10 @@ namespace System.Graphics.Models.Parsers {
 					opacity = reader.ReadSingle();
 					properties = (MeshPropertyFlag) reader.ReadUInt32();
 					associatedTextures = (MeshTexture) reader.ReadUInt32();
+					unreadSlots = (uint) associatedTextures;
 					if (textures == null || textures.Count == 0) {
 						if ((associatedTextures & MeshTexture.Diffuse) == MeshTexture.Diffuse) { //has texture
+							unreadSlots &= ~(uint) MeshTexture.Diffuse;
 							try {
 								string texturePath = Encoding.UTF8.GetString(reader.ReadBytes(64)).TruncateAtNull();
 								diffuseTexture = TextureParser.Parse(texturePath);
@@ -124,6 +148,12 @@ namespace System.Graphics.Models.Parsers {
 							diffuseTexture = null;
 					} else
 						diffuseTexture = textures;
+					//skip the texture slots which were not read, such as the specular and normal texture names
+					skipSlots = 0;
+					for (; unreadSlots != 0; unreadSlots &= unreadSlots - 1)
+						skipSlots++;
+					if (skipSlots != 0)
+						reader.ReadBytes(64 * skipSlots);
 					bufferData = new Vertex[frameCount][];
 					if (frameCount != 0) {
 						for (frame = 0; frame < frameCount; frame++) {
@@ -0,0 +1,1941 @@
+# Glest G3D Model Import/Export for Blender
+# The add-on is the io_g3d package, install it by zipping the io_g3d folder and
+# choosing the zip in "Install Add-on from File". The G3D format itself
+# (specification, reading and writing) lives in g3d.py of the package.
+###########################################################################
+
+bl_info = {
+	"name": "G3D Mesh Import/Export",
+	"description": "Import/Export .g3d file (Glest 3D)",
+	"author": "various, see head of script",
+	"version": (0, 11, 1),
+	"blender": (2, 65, 0),
+	"location": "File > Import-Export",
+	"warning": "always keep .blend files",
+	"wiki_url": "http://glest.wikia.com/wiki/G3D_support",
+	"tracker_url": "https://forum.megaglest.org/index.php?topic=6596",
+	"category": "Import-Export"}
+###########################################################################
+# Importing Structures needed (must later verify if i need them really all)
+###########################################################################
+import bpy
+from bpy.props import StringProperty
+from bpy_extras.image_utils import load_image
+from bpy_extras.io_utils import ImportHelper, ExportHelper
+
+import sys, struct, string, types, array
+import shutil, tempfile, multiprocessing
+import glob, json, time, hashlib, threading
+import zipfile, tarfile, posixpath
+from operator import sub
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from types import *
+import os
+from os import path
+from os.path import dirname, abspath
+
+import subprocess
+from mathutils import Matrix
+from math import radians
+
+try:
+	import g3d
+except ImportError:								 #g3d.py is next to this file, it's imported by its own name
+	sys.path.append(dirname(abspath(__file__)))	 #so the decoding worker processes, which have no bpy, find it too
+	import g3d
+from g3d import G3DFile, G3DMeshWriter, writemodel
+###########################################################################
+# Variables that are better Global to handle
+###########################################################################
+imported = []   #List of all imported Objects
+toexport = []   #List of Objects to export (actually only meshes)
+sceneID  = None #Points to the active Blender Scene
+profiler = g3d.Profiler()	#Timing spans and console output of the running import or export
+
+def _beginprofile(verbosity):
+	global profiler
+	profiler = g3d.Profiler(verbosity)
+
+def _endprofile(filepath, trace):
+	#Print where the time went and write the timeline next to the file, trace is None, 'NONE', 'JSON' or 'CHROME'
+	profiler.report()
+	if trace and trace != 'NONE':
+		tracepath = filepath + (".trace.json" if trace == 'CHROME' else ".profile.json")
+		profiler.write(tracepath, trace == 'CHROME')
+		profiler.log(1, "Timeline written to " + tracepath)
+
+def _run(steps):
+	#Run a step generator to its end right here and return its result. The generators yield
+	#(stage, done, total) after every step and a Future when they wait for a worker thread,
+	#G3DModalSteps runs them from a timer instead
+	while True:
+		try:
+			step = next(steps)
+		except StopIteration as stop:
+			return stop.value
+		if isinstance(step, Future):
+			wait((step,))
+
+def _timed(name, iterable):
+	#Yield the items of iterable, timing the production of each one as a span
+	iterator = iter(iterable)
+	while True:
+		with profiler.span(name):
+			try:
+				item = next(iterator)
+			except StopIteration:
+				return
+		yield item
+###########################################################################
+# Creating Blender Meshes
+###########################################################################
+def _gatheruv(texcoorddata, indices):
+	#Look up the (s,t)-pair of every index, each pair is moved as one opaque 64 bit
+	#integer so the gather runs in C through map and no float gets boxed
+	pairs = texcoorddata.cast("B").cast("Q")
+	return memoryview(array.array("Q", map(pairs.__getitem__, indices))).cast("B").cast("f")
+
+class DirectoryResolver:								 #Finds the textures of a file next to it on disk
+	def __init__(self, directory):
+		self.directory = directory
+
+	def _path(self, name):
+		return abspath(self.directory + os.sep + name)
+
+	def key(self, name):
+		texturefile = self._path(name)
+		stat = os.stat(texturefile)
+		return (texturefile, stat.st_mtime, stat.st_size)
+
+	def load(self, name):
+		return bpy.data.images.load(self._path(name))
+
+def _membername(name):
+	#Archive member names as written by the tools, "./units/tex.png" and "units\\tex.png" become "units/tex.png"
+	return posixpath.normpath(name.replace("\\", "/")).lstrip("/")
+
+def _archiveindex(archive):
+	#Normalised name to ZipInfo or TarInfo of every file in a zipfile or tarfile, built once per archive
+	#since getinfo and getmember only match the names exactly as stored
+	if isinstance(archive, zipfile.ZipFile):
+		infos = [info for info in archive.infolist() if not info.filename.endswith("/")]
+		return {_membername(info.filename): info for info in infos}
+	return {_membername(info.name): info for info in archive.getmembers() if info.isfile()}
+
+class ArchiveResolver:									 #Reads the textures of a file from the zip or tar archive holding it
+	#directory is the archive member directory of the G3D file, the images are
+	#packed into the .blend straight from the archive without extracting them.
+	#members is the index of the archive from _archiveindex
+	def __init__(self, archive, directory, members=None):
+		self.archive = archive
+		self.directory = directory
+		self.members = _archiveindex(archive) if members is None else members
+
+	def _member(self, name):
+		return self.members[_membername(posixpath.join(self.directory, name.replace("\\", "/")))]
+
+	def key(self, name):
+		info = self._member(name)
+		if isinstance(self.archive, zipfile.ZipFile):
+			return (self.archive.filename, info.filename, info.CRC, info.file_size)
+		return (self.archive.name, info.name, info.mtime, info.size)
+
+	def load(self, name):
+		info = self._member(name)
+		if isinstance(self.archive, zipfile.ZipFile):
+			data = self.archive.read(info)
+			member = info.filename
+		else:
+			data = self.archive.extractfile(info).read()
+			member = info.name
+		img = bpy.data.images.new(posixpath.basename(member), 1, 1)
+		img.pack(data=data, data_len=len(data))
+		img.source = 'FILE'
+		return img
+
+class G3DImportCache:									 #Images and materials shared by all imports of a session
+	#Images are keyed by the resolver, a path with modification time and size or an archive member,
+	#materials by their images, colors and opacity, so the Meshes of a faction sharing one atlas
+	#get one image and one material
+	def __init__(self):
+		self.images = {}
+		self.materials = {}
+		self.resetstats()
+
+	def resetstats(self):
+		self.imagehits = self.imagemisses = 0
+		self.materialhits = self.materialmisses = 0
+
+	def image(self, resolver, name):
+		key = resolver.key(name)
+		img = self._alive(self.images.get(key), bpy.data.images)
+		if img:
+			self.imagehits += 1
+			return img
+		self.imagemisses += 1
+		img = resolver.load(name)
+		self.images[key] = img
+		return img
+
+	def material(self, key, create):
+		matdata = self._alive(self.materials.get(key), bpy.data.materials)
+		if matdata:
+			self.materialhits += 1
+			return matdata
+		self.materialmisses += 1
+		matdata = create()
+		self.materials[key] = matdata
+		return matdata
+
+	def _alive(self, datablock, collection):
+		#The datablock may have been deleted since it was cached, e.g. by a new file
+		if datablock is None:
+			return None
+		try:
+			return datablock if collection.get(datablock.name) == datablock else None
+		except ReferenceError:
+			return None
+
+	def report(self):
+		profiler.log(1, "Image cache     : %d hits, %d loaded" % (self.imagehits, self.imagemisses))
+		profiler.log(1, "Material cache  : %d hits, %d created" % (self.materialhits, self.materialmisses))
+
+importcache = G3DImportCache()
+
+#Create a Mesh inside Blender
+def createMesh(resolver, header, data, toblender, operator):
+	#Weld the duplicated seam vertices on the decoded arrays, matching them over all frames, so the Mesh is built only once
+	with profiler.span("weld"):
+		remap, keep = g3d.weld(data)
+		facecount = header.indexcount // 3
+		indices, texindices = g3d.weldindices(data.indexdata[:facecount * 3], remap)
+	facecount = len(indices) // 3
+	welded = len(keep) < header.vertexcount
+	def frame(block):
+		return g3d.permute(block, keep) if welded else block
+
+	mesh = bpy.data.meshes.new(header.meshname)		#New Mesh
+	meshobj = bpy.data.objects.new(header.meshname+'Object', mesh)	 #New Object for the new Mesh
+	scene = bpy.context.scene
+	scene.objects.link(meshobj)
+	scene.update()
+	with profiler.span("material setup"):
+		img_diffuse  = None
+		img_specular = None
+		img_normal   = None
+		if header.hastexture:												  #Load Texture when assigned
+			try:
+				img_diffuse = importcache.image(resolver, header.diffusetexture)
+
+				if header.isv4:
+					if header.speculartexture:
+						img_specular = importcache.image(resolver, header.speculartexture)
+					if header.normaltexture:
+						img_normal = importcache.image(resolver, header.normaltexture)
+			except:
+				import traceback
+				traceback.print_exc()
+			
+				header.hastexture = False
+				operator.report({'WARNING'}, "Couldn't load texture. See console for details.")
+	
+	with profiler.span("mesh build"):
+		#Get the Vertices and Normals of the first frame into the empty Mesh
+		mesh.vertices.add(len(keep))
+		mesh.vertices.foreach_set("co", frame(data.vertexframe(0)))
+		mesh.vertices.foreach_set("normal", frame(data.normalframe(0)))
+
+		#Build all triangles at once, every index becomes one loop
+		mesh.loops.add(facecount * 3)
+		mesh.loops.foreach_set("vertex_index", indices)
+		mesh.polygons.add(facecount)
+		mesh.polygons.foreach_set("loop_start", array.array("i", range(0, facecount * 3, 3)))
+		mesh.polygons.foreach_set("loop_total", array.array("i", [3]) * facecount)
+		mesh.polygons.foreach_set("use_smooth", array.array("i", [True]) * facecount)
+	mesh.g3d_customColor = header.customalpha
+	mesh.show_double_sided = header.istwosided
+	if header.isv4:
+		mesh.g3d_noSelect = header.noselect
+		mesh.g3d_glow = header.glow
+		mesh.teamcolor_alpha = header.teamcoloralpha
+	else:
+		mesh.g3d_noSelect = False
+		mesh.g3d_glow = False
+	mesh.g3d_fullyOpaque = False
+	#===================================================================================================
+	#Material Setup
+	#===================================================================================================
+	def addtexslot(matdata,index,name,img):
+		texture = bpy.data.textures.new(name=name,type='IMAGE')
+		texture.image = img
+		slot = matdata.texture_slots.create(index)
+		slot.texture = texture
+		slot.texture_coords = 'UV'
+
+	def creatematerial():
+		matdata = bpy.data.materials.new(materialname + '1')
+
+		addtexslot(matdata, 0, 'diffusetexture', img_diffuse)
+		if img_specular:
+			addtexslot(matdata, 1, 'speculartexture', img_specular)
+		if img_normal:
+			addtexslot(matdata, 2, 'normaltexture', img_normal)
+
+		if header.isv4:
+			matdata.diffuse_color = (header.diffusecolor[0], header.diffusecolor[1],header.diffusecolor[2])
+			matdata.alpha = header.opacity
+			matdata.specular_color = (header.specularcolor[0], header.specularcolor[1],header.specularcolor[2])
+		return matdata
+
+	if header.hastexture:	   
+		with profiler.span("material setup"):
+			materialname = "pskmat"
+			materials = []
+			#Meshes with the same textures, colors and opacity share one material
+			key = tuple(img.name if img else None for img in (img_diffuse, img_specular, img_normal))
+			if header.isv4:
+				key += (tuple(header.diffusecolor), tuple(header.specularcolor), header.opacity)
+			materials.append(importcache.material(key, creatematerial))
+
+			for material in materials:
+				#add material to the mesh list of materials
+				mesh.materials.append(material)
+
+		with profiler.span("uv assignment"):
+			psktexname="psk0"
+			uvtex = mesh.uv_textures.new(name=psktexname)
+			mesh.uv_layers[psktexname].data.foreach_set("uv", _gatheruv(data.texcoorddata, texindices))
+			for blender_tface in uvtex.data:
+				blender_tface.image = img_diffuse
+	imported.append(meshobj)			#Add to Imported Objects
+	times = g3d.keyframes(header)
+	with profiler.span("shape keys", frames=header.framecount):
+		meshobj.shape_key_add()				#Basis
+		for x in range(1,header.framecount):	#Put in Vertex Positions for Keyanimation
+			sk = meshobj.shape_key_add()
+			sk.data.foreach_set("co", frame(data.vertexframe(x)))
+
+		# activate one shapekey per frame, the keyframes of every F-curve are added in one go.
+		# Frame i is at scene frame times[i]+1, with reduced keyframes the frames in between
+		# blend linearly from one shapekey to the next like the engine interpolates them
+		if header.framecount > 1:
+			reduced = times[-1] != header.framecount - 1
+			keys = mesh.shape_keys
+			keys.animation_data_create()
+			action = bpy.data.actions.new(name=keys.name + "Action")
+			keys.animation_data.action = action
+			for i in range(1,header.framecount):
+				shape = keys.key_blocks[i]
+				fcurve = action.fcurves.new(data_path='key_blocks["%s"].value' % shape.name)
+				fcurve.keyframe_points.add(3)
+				after = times[i+1] if i+1 < header.framecount else times[i]+1
+				fcurve.keyframe_points.foreach_set("co", (times[i-1]+1, 0.0, times[i]+1, 1.0, after+1, 0.0))
+				if reduced:
+					for point in fcurve.keyframe_points:
+						point.interpolation = 'LINEAR'
+				fcurve.update()				#recalculate the handles
+
+	meshobj.active_shape_key_index = 0
+
+	# the bounds written by the exporter, straight from the header
+	bounds = getattr(header, "bounds", None)
+	if bounds:
+		meshobj["g3d_boxmin"] = bounds.boxmin
+		meshobj["g3d_boxmax"] = bounds.boxmax
+		meshobj["g3d_center"] = bounds.center
+		meshobj["g3d_radius"] = bounds.radius
+		if header.framebounds:
+			meshobj["g3d_framebounds"] = [value for b in header.framebounds for value in b.boxmin + b.boxmax + b.center + (b.radius,)]
+
+	if toblender:
+		# rotate from glest to blender orientation
+		#mesh.transform( Matrix( ((1,0,0,0),(0,0,-1,0),(0,1,0,0),(0,0,0,1)) ) )
+		# doesn't work, maybe because of shape keys
+		# use object transformation instead
+		meshobj.rotation_euler = (radians(90), 0, 0)
+
+	# build edges from the polygons
+	mesh.update(calc_edges=True)
+	mesh.update_tag()
+
+	return
+###########################################################################
+# Import
+###########################################################################
+def _checkheader(header, operator):
+	profiler.log(2, "\nHeader ID         : " + header.id)
+	profiler.log(2, "Version           : " + str(header.version))
+	if header.id != "G3D":
+		profiler.log(0, "ERROR: This is Not a G3D Model File")
+		operator.report({'ERROR'}, "This is Not a G3D Model File")
+		return False
+	if header.version not in g3d.SUPPORTED_VERSIONS:
+		profiler.log(0, "ERROR: The Version of this G3D File is not Supported")
+		operator.report({'ERROR'}, "The Version of this G3D File is not Supported")
+		return False
+	return True
+
+def _buildmodel(filepath, header, meshes, toblender, operator, resolver=None, count=None):
+	#Step generator creating the Blender Objects of one file, meshes yields (meshheader, meshdata) pairs
+	#where meshdata may be the Future of a worker decoding it, count is the number of Meshes.
+	#Textures are looked up through resolver, by default next to filepath. Returns the maximal animationsteps
+	global imported, sceneID
+	if resolver is None:
+		resolver = DirectoryResolver(dirname(abspath(filepath)))
+	#in_editmode = Blender.Window.EditMode()			 #Must leave Editmode when active
+	#if in_editmode: Blender.Window.EditMode(0)
+	sceneID = bpy.context.scene						  #Get active Scene
+	#scenecontext=sceneID.getRenderingContext()		  #To Access the Start/Endframe its so hidden i searched till i got angry :-)
+	imported = []
+	maxframe=0
+	for x, (meshheader, meshdata) in enumerate(meshes):
+		if isinstance(meshdata, Future):
+			yield meshdata
+			meshdata = meshdata.result()
+		if header.version == 3:
+			profiler.log(2, "\nMesh Number         : " + str(x+1))
+			profiler.log(2, "framecount            : " + str(meshheader.framecount))
+			profiler.log(2, "normalframecount      : " + str(meshheader.normalframecount))
+			profiler.log(2, "texturecoordframecount: " + str(meshheader.texturecoordframecount))
+			profiler.log(2, "colorframecount       : " + str(meshheader.colorframecount))
+			profiler.log(2, "pointcount            : " + str(meshheader.vertexcount))
+			profiler.log(2, "indexcount            : " + str(meshheader.indexcount))
+			profiler.log(2, "texturename           : " + str(meshheader.diffusetexture))
+			profiler.log(2, "hastexture            : " + str(meshheader.hastexture))
+			profiler.log(2, "istwosided            : " + str(meshheader.istwosided))
+			profiler.log(2, "customalpha           : " + str(meshheader.customalpha))
+		else:
+			profiler.log(2, "\nMesh Number   : " + str(x+1))
+			profiler.log(2, "meshname        : " + str(meshheader.meshname))
+			profiler.log(2, "framecount      : " + str(meshheader.framecount))
+			profiler.log(2, "vertexcount     : " + str(meshheader.vertexcount))
+			profiler.log(2, "indexcount      : " + str(meshheader.indexcount))
+			profiler.log(2, "diffusecolor    : %1.6f %1.6f %1.6f" %meshheader.diffusecolor)
+			profiler.log(2, "specularcolor   : %1.6f %1.6f %1.6f" %meshheader.specularcolor)
+			profiler.log(2, "specularpower   : %1.6f" %meshheader.specularpower)
+			profiler.log(2, "opacity         : %1.6f" %meshheader.opacity)
+			profiler.log(2, "teamcoloralpha  : %d" %meshheader.teamcoloralpha)
+			profiler.log(2, "properties      : " + str(meshheader.properties))
+			profiler.log(2, "textures        : " + str(meshheader.textures))
+			profiler.log(2, "texturename     : " + str(meshheader.diffusetexture))
+		for warning in getattr(meshheader, "warnings", ()):
+			profiler.log(0, "WARNING: %s: %s" % (meshheader.meshname.split("\0")[0], warning))
+			operator.report({'WARNING'}, warning)
+		frames = g3d.keyframes(meshheader)[-1] + 1 if meshheader.framecount else 0
+		if frames > maxframe: maxframe = frames #Evaluate the maximal animationsteps
+		with profiler.span("create mesh", mesh=meshheader.meshname):
+			createMesh(resolver, meshheader, meshdata, toblender, operator)
+		meshdata = None								 #Release the views into the mapping
+		yield ("meshes", x + 1, count)
+
+	anchor = bpy.data.objects.new('Empty', None)
+	anchor.select = True
+	bpy.context.scene.objects.link(anchor)
+	for ob in imported:
+			ob.parent = anchor
+	return maxframe
+
+def _finishimport(maxframe):
+	bpy.context.scene.frame_start=1
+	bpy.context.scene.frame_end=maxframe
+	bpy.context.scene.frame_current=1
+	bpy.context.scene.update()
+	profiler.log(2, "Created a empty Object as 'Grip' where all imported Objects are parented to")
+	profiler.log(2, "To move the complete Meshes only select this empty Object and move it")
+	profiler.log(1, "All Done, have a good Day :-)\n\n")
+
+def _loadfile(source, name, toblender, operator, resolver, background=False):
+	#Step generator importing one file given by path or binary stream, returns the maximal animationsteps or None.
+	#With background the Meshdata is decoded on a worker thread while the Blender Objects are created
+	with profiler.span("header parse"):
+		g3dfile = G3DFile(source, name)					 #Maps the File and indexes the Meshes, no Meshdata is read yet
+	profiler.log(1, "\nNow Importing File: " + g3dfile.filepath)
+	with g3dfile:
+		if not _checkheader(g3dfile.header, operator):
+			return None
+		profiler.log(2, "Number of Meshes  : " + str(g3dfile.modelheader.meshcount))
+		headers = [entry.header for entry in g3dfile.meshes]
+		if not background:
+			#Materialise the arrays of one Mesh at a time
+			meshes = _timed("data decode", ((header, g3dfile.meshdata(x)) for x, header in enumerate(headers)))
+			return (yield from _buildmodel(g3dfile.filepath, g3dfile.header, meshes, toblender, operator, resolver, len(headers)))
+		pool = ThreadPoolExecutor(max_workers=1)
+		decoded = [pool.submit(g3dfile.meshdata, x) for x in range(len(headers))]
+		try:
+			return (yield from _buildmodel(g3dfile.filepath, g3dfile.header, zip(headers, decoded), toblender, operator, resolver, len(headers)))
+		finally:
+			for future in decoded:
+				future.cancel()
+			pool.shutdown()
+			decoded = None
+
+def G3DLoader(source, toblender, operator, verbosity=1, trace=None, resolver=None):	#Main Import Routine
+	#source is a path or a binary stream like a zipfile member, the textures are looked up
+	#through resolver, by default in the directory of the file
+	_run(G3DLoaderSteps(source, toblender, operator, verbosity, trace, resolver))
+
+def G3DLoaderSteps(source, toblender, operator, verbosity=1, trace=None, resolver=None, background=False):
+	#G3DLoader as a step generator, with background the Meshdata is decoded on a worker thread
+	_beginprofile(verbosity)
+	importcache.resetstats()
+	name = source if isinstance(source, str) else str(getattr(source, "name", "stream"))
+	maxframe = yield from _loadfile(source, name, toblender, operator, resolver, background)
+	if maxframe is None:
+		return
+	importcache.report()
+	_finishimport(maxframe)
+	_endprofile(name, trace)
+	return
+
+def _archivemembers(members):
+	#Names of the G3D files in an archive index from _archiveindex
+	return sorted(name for name in members if name.lower().endswith(".g3d"))
+
+def G3DArchiveLoader(archivepath, toblender, operator, verbosity=1, trace=None):	#Import every G3D file of a zip or tar mod package
+	#The files and their textures are read straight from the archive, nothing is extracted to disk
+	_beginprofile(verbosity)
+	importcache.resetstats()
+	maxframe = 0
+	failed = 0
+	if zipfile.is_zipfile(archivepath):
+		archive = zipfile.ZipFile(archivepath)
+		openmember = archive.open
+	else:
+		archive = tarfile.open(archivepath)
+		openmember = archive.extractfile
+	try:
+		index = _archiveindex(archive)
+		members = _archivemembers(index)
+		if not members:
+			operator.report({'ERROR'}, "no .g3d files in " + os.path.basename(archivepath))
+			return 1
+		for member in members:
+			resolver = ArchiveResolver(archive, posixpath.dirname(member), index)
+			with openmember(index[member]) as stream:
+				try:
+					frames = _run(_loadfile(stream, member, toblender, operator, resolver))
+				except (EOFError, struct.error) as e:
+					profiler.log(0, "ERROR: " + str(e))
+					operator.report({'ERROR'}, "%s: %s" % (member, e))
+					frames = None
+			if frames is None:
+				failed += 1
+				continue
+			maxframe = max(maxframe, frames)
+	finally:
+		archive.close()
+	importcache.report()
+	_finishimport(maxframe)
+	_endprofile(archivepath, trace)
+	return failed
+
+def G3DMultiLoader(filepaths, toblender, operator, workers=None, verbosity=1, trace=None):	#Import many files, decoding them in parallel
+	#Decoding is format only and runs in a process pool, just the Blender Objects are created here
+	if getattr(bpy.app, "binary_path_python", None):
+		multiprocessing.set_executable(bpy.app.binary_path_python)	#sys.executable is Blender itself
+	_beginprofile(verbosity)
+	maxframe = 0
+	failed = 0
+	importcache.resetstats()
+	#the span of a file is the time spent waiting for its decoded data
+	for filepath, header, meshes, error in _timed("data decode", g3d.decodefiles(filepaths, workers)):
+		profiler.log(1, "\nNow Importing File: " + filepath)
+		if error:
+			profiler.log(0, "ERROR: " + str(error))
+			operator.report({'ERROR'}, "%s: %s" % (os.path.basename(filepath), error))
+			failed += 1
+			continue
+		if not _checkheader(header, operator):
+			failed += 1
+			continue
+		profiler.log(2, "Number of Meshes  : " + str(len(meshes)))
+		maxframe = max(maxframe, _run(_buildmodel(filepath, header, meshes, toblender, operator, None, len(meshes))))
+		meshes = None
+	importcache.report()
+	_finishimport(maxframe)
+	if filepaths:
+		_endprofile(filepaths[0], trace)
+	return failed
+
+def _framedata(m, attr):
+	#Flat array of a vertex attribute of an evaluated mesh
+	data = array.array("f", [0.0]) * (len(m.vertices) * 3)
+	m.vertices.foreach_get(attr, data)
+	return data
+
+def _splitseams(mesh, textured, uvepsilon=0.0):
+	# triangulates the tessfaces of mesh, quads are split into [0,1,2] + [0,2,3]
+	# blender allows to have multiple texcoords per vertex,
+	# in g3d format every vertex can only have one texcoord
+	# -> duplicate vertex
+	# every corner is hashed on (vertex index, s, t) in a single pass, with uvepsilon
+	# the texcoords are quantised first so nearly identical ones share a vertex
+	# returns the index buffer, the list of vertex indices which need to be
+	# duplicated and the list of texcoords
+	facecount = len(mesh.tessfaces)
+	vertexcount = len(mesh.vertices)
+	raw = array.array("i", [0]) * (facecount * 4)
+	mesh.tessfaces.foreach_get("vertices_raw", raw)
+	indices = array.array("I")
+	newverts = []
+	uvlist = []
+	if not textured:
+		for f in range(0, facecount * 4, 4):
+			indices.extend((raw[f], raw[f+1], raw[f+2]))
+			if raw[f+3]: # new face because quad got split
+				indices.extend((raw[f], raw[f+2], raw[f+3]))
+		return indices, newverts, uvlist
+
+	uvraw = array.array("f", [0.0]) * (facecount * 8)
+	mesh.tessface_uv_textures[0].data.foreach_get("uv_raw", uvraw)
+	scale = 1.0 / uvepsilon if uvepsilon > 0.0 else 0.0
+	uvlist[:] = [(0.0, 0.0)] * vertexcount
+	used = bytearray(vertexcount) # whether the blender vertex got its texcoord already
+	vdict = dict() # (vertex index, s, t) -> index in the g3d vertex list
+	for f in range(facecount):
+		corners = (0, 1, 2, 0, 2, 3) if raw[f*4+3] else (0, 1, 2)
+		for i in corners:
+			vindex = raw[f*4+i]
+			uv = (uvraw[f*8+i*2], uvraw[f*8+i*2+1]) # that's a (s,t)-pair
+			if scale:
+				key = (vindex, round(uv[0] * scale), round(uv[1] * scale))
+			else:
+				key = (vindex, uv[0], uv[1])
+			index = vdict.get(key)
+			if index is None:
+				if not used[vindex]: # new vertex -> keep its index
+					used[vindex] = 1
+					index = vindex
+					uvlist[vindex] = uv
+				else: # same vertex as before but with different texcoord -> duplicate
+					index = vertexcount + len(newverts)
+					newverts.append(vindex)
+					uvlist.append(uv)
+				vdict[key] = index
+			indices.append(index)
+	return indices, newverts, uvlist
+
+def G3DSaver(filepath, context, toglest, operator, uvepsilon=0.0, version=4, optimize=False, lods=0, lodratio=0.5,
+		verbosity=1, trace=None, incremental=False, static=True, staticepsilon=0.0, keyerror=0.0,
+		bounds=False, atlas=False, atlaspadding=4, merge=False):
+	return _run(G3DSaverSteps(filepath, context, toglest, operator, uvepsilon, version, optimize, lods, lodratio,
+		verbosity, trace, incremental, static, staticepsilon, keyerror, bounds, atlas, atlaspadding, merge))
+
+def G3DSaverSteps(filepath, context, toglest, operator, uvepsilon=0.0, version=4, optimize=False, lods=0, lodratio=0.5,
+		verbosity=1, trace=None, incremental=False, static=True, staticepsilon=0.0, keyerror=0.0,
+		bounds=False, atlas=False, atlaspadding=4, merge=False):
+	#G3DSaver as a step generator, the file is encoded on a worker thread into name.g3d.part
+	#which replaces the file when it's complete, so a cancelled export leaves the old file
+	_beginprofile(verbosity)
+	profiler.log(1, "\nNow Exporting File: " + filepath)
+
+	objs = context.selected_objects
+	if len(objs) == 0:
+		objs = bpy.data.objects
+
+	#get real meshcount as len(bpy.data.meshes) holds also old meshes
+	meshobjs = [obj for obj in objs if obj.type == 'MESH']
+	for obj in meshobjs:
+		if obj.mode != 'OBJECT': # we want to be in object mode
+			profiler.log(0, "ERROR: mesh not in object mode")
+			operator.report({'ERROR'}, "mesh not in object mode")
+			return -1
+
+	if len(meshobjs) == 0:
+		profiler.log(0, "ERROR: no meshes found")
+		operator.report({'ERROR'}, "no meshes found")
+		return -1
+
+	frameCount = context.scene.frame_end - context.scene.frame_start +1
+	#Incremental export splices the Meshes whose hash didn't change from the previous file,
+	#only the others are evaluated. LODs need the frames of every Mesh, the atlas layout the texcoords
+	#of every Mesh and merging writes Meshes made of several objects, so they turn it off
+	options = {"version": version, "toglest": toglest, "uvepsilon": uvepsilon, "optimize": optimize,
+		"frames": [context.scene.frame_start, context.scene.frame_end], "static": static, "staticepsilon": staticepsilon,
+		"keyerror": keyerror, "bounds": bounds, "atlas": atlas, "atlaspadding": atlaspadding, "merge": merge}
+	hashes = {}
+	cached = {}
+	if incremental:
+		with profiler.span("cache lookup"):
+			hashes = dict((obj.name, _objecthash(obj)) for obj in meshobjs)
+			if lods == 0 and not atlas and not merge:
+				cached = _cachedblocks(filepath, options, hashes)
+		profiler.log(1, "%d of %d meshes unchanged since the last export" % (len(cached), len(meshobjs)))
+	textureatlas = None
+	if atlas:
+		textureatlas = TextureAtlas(filepath, atlaspadding)
+		with profiler.span("atlas layout"):
+			yield from textureatlas.layout(meshobjs, operator)
+		if not textureatlas.size:
+			textureatlas = None
+	writers = []
+	writing = None
+	cancelled = threading.Event()
+	partpath = filepath + ".part"
+	try:
+		res = yield from _preparemeshes([obj for obj in meshobjs if obj.name not in cached], frameCount, operator, uvepsilon, optimize, writers,
+			textureatlas)
+		if bounds and version != 5:
+			profiler.log(0, "WARNING: bounding volumes need G3D version 5, they are not written")
+			operator.report({'WARNING'}, "bounding volumes need G3D version 5, they are not written")
+		for obj, writer in writers:
+			writer.bounds = bounds and version == 5		#computed in the frame loop, from the frames as they are added
+		if res == 0 and writers:
+			res = yield from _evaluateframes(context, writers, toglest, operator, StaticCheck(staticepsilon) if static else None)
+		if res == 0 and len(writers) > 1 and merge:
+			yield from _mergemeshes(writers, version, operator)
+		if res == 0 and writers and keyerror > 0.0:
+			yield from _reducekeys(writers, keyerror, version, operator)
+		if res == 0:
+			fresh = dict((obj.name, writer) for obj, writer in writers)
+			ordered = [(obj, cached[obj.name] if obj.name in cached else fresh[obj.name]) for obj in meshobjs
+				if obj.name in cached or obj.name in fresh]
+			yield ("writing", 0, 1)
+			with profiler.span("file write"):
+				pool = ThreadPoolExecutor(max_workers=1)
+				writing = pool.submit(_writepart, partpath, [writer for obj, writer in ordered], version, cancelled)
+				pool.shutdown(wait=False)
+				yield writing
+				ranges = writing.result()
+			os.replace(partpath, filepath)
+			if textureatlas:
+				yield from textureatlas.save()
+			if incremental and not merge:
+				_savecache(filepath, options, hashes, [obj.name for obj in meshobjs], ranges)
+			if version == 5 and writers:
+				_reportcompression(writers, operator)
+			if lods > 0:
+				yield from _writelods(filepath, writers, lods, lodratio, version, operator)
+	finally:
+		if writing is not None and not writing.done():
+			#cancelled while encoding, the worker stops before its next Mesh and removes the part file,
+			#the writers are closed once it doesn't read them anymore
+			cancelled.set()
+			writing.add_done_callback(lambda future: _closewriters(writers))
+		else:
+			if os.path.exists(partpath):
+				os.remove(partpath)
+			_closewriters(writers)
+	_endprofile(filepath, trace)
+	return res
+
+def _writepart(partpath, writers, version, cancelled):
+	#Runs on the worker thread and owns partpath, which is removed when the write fails or is cancelled
+	try:
+		with open(partpath, "wb") as fileID:
+			ranges = writemodel(fileID, writers, version, cancelled)
+	except:
+		os.remove(partpath)
+		raise
+	if ranges is None:
+		os.remove(partpath)
+	return ranges
+
+def _closewriters(writers):
+	for obj, writer in writers:
+		writer.close()
+
+def _mergemeshes(writers, version, operator):
+	#Step generator to concatenate the Meshes which have the same flags, material, textures and frame count into one Mesh each,
+	#named after the first one. writers is replaced by the merged (first object, writer) pairs
+	groups = {}
+	for obj, writer in writers:
+		groups.setdefault(g3d.mergekey(writer), []).append((obj, writer))
+	merged = []
+	saved = 0
+	with profiler.span("merge"):
+		for count, (obj, writer) in enumerate(writers):
+			group = groups.pop(g3d.mergekey(writer), None)
+			if group is None:			#already merged into an earlier Mesh
+				continue
+			if len(group) == 1:
+				merged.append(group[0])
+				continue
+			merged.append((group[0][0], g3d.mergewriters([writer for obj, writer in group])))
+			saved += sum(_meshheadersize(writer, version) for obj, writer in group[1:])
+			profiler.log(2, "%s: merged %s" % (group[0][1].meshname, ", ".join(writer.meshname for obj, writer in group[1:])))
+			yield ("merging", count + 1, len(writers))
+	for obj, writer in writers:
+		if (obj, writer) not in merged:
+			writer.close()
+	message = "merged %d meshes into %d, %d header bytes saved" % (len(writers), len(merged), saved)
+	writers[:] = merged
+	profiler.log(1, message)
+	operator.report({'INFO'}, message)
+
+def _meshheadersize(writer, version):
+	#Bytes of a Mesh Header with its texture names, what every Mesh costs on top of its data
+	if version == 3:
+		return struct.calcsize(G3DMeshWriter.header_formatv3)
+	return struct.calcsize(G3DMeshWriter.header_format) + 64 * len(writer.texnames) + (8 if version == 5 else 0)
+
+def _reducekeys(writers, keyerror, version, operator):
+	#Step generator keeping only the frames which can't be interpolated from their neighbours,
+	#their times go in the V5 FTIM chunk
+	if version != 5:
+		profiler.log(0, "WARNING: keyframe reduction needs G3D version 5, all frames are written")
+		operator.report({'WARNING'}, "keyframe reduction needs G3D version 5, all frames are written")
+		return
+	before = sum(writer.frameCount for obj, writer in writers)
+	with profiler.span("keyframe reduction"):
+		for count, (obj, writer) in enumerate(writers):
+			frames = writer.frameCount
+			writer.reducekeys(keyerror)
+			profiler.log(2, "%s: %d of %d frames kept" % (writer.meshname, writer.frameCount, frames))
+			yield ("keyframes", count + 1, len(writers))
+	message = "keyframe reduction kept %d of %d frames" % (sum(writer.frameCount for obj, writer in writers), before)
+	profiler.log(1, message)
+	operator.report({'INFO'}, message)
+
+def _cachedblocks(filepath, options, hashes):
+	#The encoded Meshes of the previous export whose hash matches, read from the file before it's overwritten.
+	#The cache index filepath.cache.json is only trusted if the file is the one it was written with
+	try:
+		with open(filepath + ".cache.json") as f:
+			cache = json.load(f)
+		stat = os.stat(filepath)
+		if cache.get("options") != options or cache.get("size") != stat.st_size or cache.get("mtime") != stat.st_mtime:
+			return {}
+		blocks = {}
+		with open(filepath, "rb") as fileID:
+			for name, entry in cache["meshes"].items():
+				if hashes.get(name) is not None and hashes.get(name) == entry["hash"]:
+					fileID.seek(entry["start"])
+					block = fileID.read(entry["end"] - entry["start"])
+					if len(block) == entry["end"] - entry["start"]:
+						blocks[name] = g3d.G3DMeshBlock(entry["meshname"], block)
+		return blocks
+	except (IOError, OSError, ValueError, KeyError, TypeError):
+		return {}
+
+def _savecache(filepath, options, hashes, names, ranges):
+	stat = os.stat(filepath)
+	with open(filepath, "rb") as fileID:		#the Mesh name is the first field of a V4 and V5 Mesh Header
+		meshnames = []
+		for start, end in ranges:
+			fileID.seek(start)
+			meshnames.append(str(fileID.read(64).split(b"\0")[0], "ascii") if options["version"] != 3 else "")
+	cache = {"options": options, "size": stat.st_size, "mtime": stat.st_mtime,
+		"meshes": dict((name, {"hash": hashes[name], "meshname": meshname, "start": start, "end": end})
+			for name, meshname, (start, end) in zip(names, meshnames, ranges))}
+	with open(filepath + ".cache.json", "w") as f:
+		json.dump(cache, f, indent=1)
+
+class _Unhashable(Exception):
+	pass
+
+def _objecthash(obj):
+	#Hash of everything the exported Mesh of obj depends on: mesh data, materials, G3D properties,
+	#transformation with the parent chain and constraints, modifiers with the objects they use, shape keys
+	#and animation. None when it depends on something that isn't followed, the Mesh is encoded again then
+	try:
+		return _hashmesh(obj)
+	except _Unhashable:
+		return None
+
+def _hashmesh(obj):
+	h = hashlib.sha1()
+	def add(value):
+		h.update(repr(value).encode("utf-8"))
+	mesh = obj.data
+	add((obj.name, mesh.name))
+	_hashplacement(h, obj, set())
+	h.update(_framedata(mesh, "co"))
+	loops = array.array("i", [0]) * len(mesh.loops)
+	mesh.loops.foreach_get("vertex_index", loops)
+	h.update(loops)
+	totals = array.array("i", [0]) * len(mesh.polygons)
+	mesh.polygons.foreach_get("loop_total", totals)
+	h.update(totals)
+	for layer in mesh.uv_layers:
+		uv = array.array("f", [0.0]) * (len(layer.data) * 2)
+		layer.data.foreach_get("uv", uv)
+		h.update(uv)
+	#vertex groups and weights, what an Armature modifier deforms by
+	add([(group.name, group.index) for group in obj.vertex_groups])
+	if len(obj.vertex_groups):
+		groups = array.array("i")
+		weights = array.array("f")
+		for vertex in mesh.vertices:
+			groups.append(len(vertex.groups))
+			for element in vertex.groups:
+				groups.append(element.group)
+				weights.append(element.weight)
+		h.update(groups)
+		h.update(weights)
+	add((mesh.show_double_sided, mesh.g3d_customColor, mesh.teamcolor_alpha, mesh.g3d_noSelect, mesh.g3d_glow, mesh.g3d_fullyOpaque,
+		mesh.g3d_keepAnimated))
+	for material in mesh.materials:
+		if material:
+			add((material.name, tuple(material.diffuse_color), tuple(material.specular_color), material.alpha,
+				[slot.texture.image.filepath if slot and slot.texture and slot.texture.type == 'IMAGE' and slot.texture.image else None
+					for slot in material.texture_slots]))
+	for modifier in obj.modifiers:
+		add(_rnavalues(modifier))
+		target = getattr(modifier, "object", None)
+		if target:
+			_hashplacement(h, target, set())
+	if mesh.shape_keys:
+		for key in mesh.shape_keys.key_blocks:
+			add((key.name, key.value, key.relative_key.name, key.mute))
+			co = array.array("f", [0.0]) * (len(key.data) * 3)
+			key.data.foreach_get("co", co)
+			h.update(co)
+		_hashanimation(h, mesh.shape_keys)
+	return h.hexdigest()
+
+def _rnavalues(rnastruct):
+	#(name, value) of every RNA property, datablocks by name and collections by length
+	values = []
+	for prop in rnastruct.bl_rna.properties:
+		if prop.identifier == "rna_type":
+			continue
+		value = getattr(rnastruct, prop.identifier, None)
+		if prop.type == 'POINTER':
+			value = getattr(value, "name", None)
+		elif prop.type == 'COLLECTION':
+			value = len(value)
+		elif getattr(prop, "array_length", 0):
+			value = tuple(value)
+		values.append((prop.identifier, value))
+	return values
+
+def _hashplacement(h, obj, seen):
+	#Where obj is over the animation: its transformation, pose and animation, its constraints with their targets
+	#and the same for every parent up the chain. seen holds the names already hashed, which ends cycles
+	if obj.name in seen:
+		return
+	seen.add(obj.name)
+	h.update(repr((obj.name, [tuple(row) for row in obj.matrix_world], [tuple(row) for row in obj.matrix_basis],
+		[tuple(row) for row in obj.matrix_parent_inverse], obj.parent_type, obj.parent_bone,
+		tuple(obj.parent_vertices))).encode("utf-8"))
+	if obj.pose:
+		for bone in obj.pose.bones:
+			h.update(repr((bone.name, [tuple(row) for row in bone.matrix_basis],
+				[tuple(row) for row in bone.bone.matrix_local])).encode("utf-8"))
+			for constraint in bone.constraints:
+				_hashconstraint(h, constraint, seen)
+	for constraint in obj.constraints:
+		_hashconstraint(h, constraint, seen)
+	_hashanimation(h, obj)
+	if obj.parent:
+		_hashplacement(h, obj.parent, seen)
+	else:
+		h.update(b"no parent")
+
+def _hashconstraint(h, constraint, seen):
+	h.update(repr(_rnavalues(constraint)).encode("utf-8"))
+	targets = [getattr(constraint, attr, None) for attr in ("target", "pole_target")]
+	for target in getattr(constraint, "targets", ()):		#Armature constraint
+		h.update(repr((target.subtarget, target.weight)).encode("utf-8"))
+		targets.append(target.target)
+	for target in targets:
+		if target is None:
+			continue
+		if not isinstance(target, bpy.types.Object):
+			raise _Unhashable(constraint.name)
+		_hashplacement(h, target, seen)
+
+def _hashanimation(h, datablock):
+	#The action, the NLA tracks with their strips and actions and the drivers of datablock. Drivers
+	#may read any property of any datablock, so their variables aren't followed
+	animation = datablock.animation_data
+	if not animation:
+		return
+	h.update(repr((animation.action_blend_type, animation.action_influence, animation.action_extrapolation,
+		animation.use_nla)).encode("utf-8"))
+	_hashaction(h, animation.action)
+	for track in animation.nla_tracks:
+		h.update(repr((track.name, track.mute, track.is_solo)).encode("utf-8"))
+		for strip in track.strips:
+			h.update(repr(_rnavalues(strip)).encode("utf-8"))
+			_hashaction(h, strip.action)
+	for driver in animation.drivers:
+		if len(driver.driver.variables):
+			raise _Unhashable(driver.data_path)
+	_hashfcurves(h, animation.drivers)
+
+def _hashaction(h, action):
+	h.update(repr(action.name if action else None).encode("utf-8"))
+	if action:
+		_hashfcurves(h, action.fcurves)
+
+def _hashfcurves(h, fcurves):
+	for fcurve in fcurves:
+		h.update(repr((fcurve.data_path, fcurve.array_index, fcurve.mute)).encode("utf-8"))
+		for attr in ("co", "handle_left", "handle_right"):
+			points = array.array("f", [0.0]) * (len(fcurve.keyframe_points) * 2)
+			fcurve.keyframe_points.foreach_get(attr, points)
+			h.update(points)
+		h.update(repr([point.interpolation for point in fcurve.keyframe_points]).encode("utf-8"))
+		if len(fcurve.modifiers):
+			raise _Unhashable(fcurve.data_path)
+
+def _reportcompression(writers, operator):
+	rawsize = sum(writer.stats["rawsize"] for obj, writer in writers)
+	size = sum(writer.stats["size"] for obj, writer in writers)
+	maxerror = max(writer.stats["maxerror"] for obj, writer in writers)
+	for obj, writer in writers:
+		profiler.log(2, "%s: %d -> %d bytes (%.1f:1), max error %g" % (writer.meshname, writer.stats["rawsize"],
+			writer.stats["size"], writer.stats["ratio"], writer.stats["maxerror"]))
+	message = "vertex data compressed %.1f:1 (%d -> %d bytes), max positional error %g" % (
+		rawsize / size if size else 0.0, rawsize, size, maxerror)
+	profiler.log(1, message)
+	operator.report({'INFO'}, message)
+
+def _writelods(filepath, writers, lods, lodratio, version, operator):
+	#Step generator for the LODs, one step per Mesh and level. Level n keeps lodratio**n of the triangles of every Mesh and is written next to the model as
+	#name_lodn.g3d, name.lod.json lists the triangle counts and errors of all levels
+	base, ext = os.path.splitext(filepath)
+	levels = [{"file": os.path.basename(filepath), "ratio": 1.0,
+		"meshes": [{"name": writer.meshname, "triangles": len(writer.indices) // 3, "error": 0.0} for obj, writer in writers]}]
+	for level in range(1, lods + 1):
+		lodpath = "%s_lod%d%s" % (base, level, ext)
+		lodwriters = []
+		try:
+			with profiler.span("lod", level=level):
+				for obj, writer in writers:
+					lodwriters.append(writer.simplified(lodratio ** level))
+					yield ("LOD %d" % level, len(lodwriters), len(writers))
+			with profiler.span("file write", level=level):
+				with open(lodpath, "wb") as fileID:
+					writemodel(fileID, lodwriters, version)
+			levels.append({"file": os.path.basename(lodpath), "ratio": lodratio ** level,
+				"meshes": [{"name": writer.meshname, "triangles": writer.lod["triangles"], "error": writer.lod["error"]} for writer in lodwriters]})
+		finally:
+			for writer in lodwriters:
+				writer.close()
+		message = "LOD %d: %d triangles, max error %g" % (level, sum(mesh["triangles"] for mesh in levels[-1]["meshes"]),
+			max(mesh["error"] for mesh in levels[-1]["meshes"]))
+		profiler.log(1, message + " -> " + lodpath)
+		operator.report({'INFO'}, message)
+	with open(base + ".lod.json", "w") as f:
+		json.dump({"levels": levels}, f, indent=1)
+
+class TextureAtlas:										 #The diffuse, specular and normal images of the Meshes packed into one atlas each
+	#Meshes sharing the diffuse, specular and normal images share a rect, the specular and normal images go to
+	#the same rect of their own atlas and are scaled to the size of the diffuse one. Meshes with texcoords
+	#outside 0..1 tile their image and keep it, as do Meshes without a diffuse image
+	slotnames = ("", "_specular", "_normal")
+	defaults = ((0.0, 0.0, 0.0, 0.0), (0.0, 0.0, 0.0, 1.0), (0.5, 0.5, 1.0, 1.0))
+
+	def __init__(self, filepath, padding):
+		self.filepath = filepath
+		self.padding = padding
+		self.rects = {}						#object name: (x, y, width, height) in the atlas
+		self.images = []					#[diffuse, specular, normal] of every rect
+		self.textures = 0
+		self.size = None
+
+	def layout(self, meshobjs, operator):
+		# step generator placing the images of meshobjs, size stays None when there's nothing to pack
+		placed = {}
+		sizes = []
+		for count, obj in enumerate(meshobjs):
+			yield ("atlas layout", count, len(meshobjs))
+			images = self._images(obj)
+			if not images or not images[0].size[0] or self._tiles(obj.data):
+				continue
+			key = tuple(image.name if image else None for image in images)
+			if key not in placed:
+				placed[key] = len(self.images)
+				self.images.append(images)
+				sizes.append(tuple(images[0].size))
+			self.rects[obj.name] = placed[key]
+			self.textures |= sum(1 << i for i, image in enumerate(images) if image)
+		skipped = len([obj for obj in meshobjs if obj.name not in self.rects])
+		if skipped:
+			profiler.log(1, "%d meshes keep their own textures, they are untextured or tile them" % skipped)
+		packed = g3d.packatlas(sizes, self.padding) if len(sizes) > 1 else None
+		if not packed:
+			if len(sizes) > 1:
+				operator.report({'WARNING'}, "textures don't fit in an 8192x8192 atlas, they are kept as they are")
+			self.rects = {}
+			return
+		width, height, positions = packed
+		self.size = (width, height)
+		self.rects = dict((name, positions[index] + sizes[index]) for name, index in self.rects.items())
+		self.positions = positions
+		base = os.path.splitext(self.filepath)[0]
+		self.filepaths = [base + "_atlas" + self.slotnames[i] + ".png" for i in range(3)]
+		self.texnames = [os.path.basename(self.filepaths[i]) for i in range(3) if self.textures & (1 << i)]
+		profiler.log(1, "%d images packed into a %dx%d atlas" % (len(sizes), width, height))
+
+	def _images(self, obj):
+		# the [diffuse, specular, normal] images the exporter uses for obj, the same slots as _preparemeshes
+		mesh = obj.data
+		if not mesh.materials or not mesh.materials[0] or not len(mesh.uv_textures):
+			return None
+		images = []
+		for i in range(3):
+			slot = mesh.materials[0].texture_slots[i]
+			images.append(slot.texture.image if slot and slot.texture and slot.texture.type == 'IMAGE' else None)
+		return images if images[0] else None
+
+	def _tiles(self, mesh):
+		# whether the texcoords _splitseams exports, those of the first tessface uv layer, leave 0..1
+		mesh.update(calc_tessface=True)
+		facecount = len(mesh.tessfaces)
+		if not facecount or not len(mesh.tessface_uv_textures):
+			return False
+		raw = array.array("i", [0]) * (facecount * 4)
+		mesh.tessfaces.foreach_get("vertices_raw", raw)
+		uvraw = array.array("f", [0.0]) * (facecount * 8)
+		mesh.tessface_uv_textures[0].data.foreach_get("uv_raw", uvraw)
+		uv = [c for f in range(facecount) for c in uvraw[f*8:f*8 + (8 if raw[f*4+3] else 6)]]
+		return min(uv) < -0.0001 or max(uv) > 1.0001
+
+	def uvlist(self, obj, uvlist):
+		# the texcoords of obj in atlas space
+		return g3d.atlasuv(uvlist, self.rects[obj.name], self.size)
+
+	def save(self):
+		# step generator writing one PNG per texture slot used by any of the Meshes, one step per image
+		width, height = self.size
+		slots = [i for i in range(3) if self.textures & (1 << i)]
+		for done, i in enumerate(slots):
+			with profiler.span("atlas", slot=i):
+				pixels = array.array("f", self.defaults[i]) * (width * height)
+				for count, (images, (x, y)) in enumerate(zip(self.images, self.positions)):
+					yield ("atlas", done * len(self.images) + count, len(slots) * len(self.images))
+					image = images[i]
+					if not image:
+						continue
+					w, h = images[0].size
+					if tuple(image.size) != (w, h):
+						image = image.copy()
+						image.scale(w, h)
+					g3d.blit(pixels, width, array.array("f", image.pixels[:]), w, h, x, y, self.padding)
+					if image != images[i]:
+						bpy.data.images.remove(image)
+				atlas = bpy.data.images.new(os.path.basename(self.filepaths[i]), width, height, alpha=True)
+				atlas.pixels[:] = pixels
+				atlas.filepath_raw = self.filepaths[i]
+				atlas.file_format = 'PNG'
+				atlas.save()
+				bpy.data.images.remove(atlas)
+			profiler.log(1, "Atlas written to " + self.filepaths[i])
+
+def _preparemeshes(meshobjs, frameCount, operator, uvepsilon, optimize, writers, atlas=None):
+	#Step generator for everything of a Mesh which doesn't change over the animation: material, texture names
+	#and seam split indices. The texcoords of the Meshes in atlas are moved into their rect and they all get the
+	#atlas texture names
+	for count, obj in enumerate(meshobjs):
+		mesh = obj.data.copy()
+		diffuseColor = [1.0, 1.0, 1.0]
+		specularColor = [0.9, 0.9, 0.9]
+		opacity = 1.0
+		textures = 0
+		texnames = []
+		if len(mesh.materials) > 0:
+			# we have a texture, hopefully
+			material = mesh.materials[0]
+			slot = material.texture_slots[0]
+			# only look for other textures when we have diffuse
+			if slot and slot.texture.type=='IMAGE' and len(mesh.uv_textures)>0:
+				diffuseColor = material.diffuse_color
+				specularColor = material.specular_color
+				opacity = material.alpha
+				textures = 1
+				texnames.append(bpy.path.basename(slot.texture.image.filepath))
+				# specular and normal
+				for i in range(1, 3):
+					slot = material.texture_slots[i]
+					if slot and slot.texture.type=='IMAGE':
+						texnames.append(bpy.path.basename(slot.texture.image.filepath))
+						textures |= 1 << i
+					
+			else:
+				profiler.log(0, "WARNING: first texture slot in first material isn't of type IMAGE or it's not unwrapped, texture ignored")
+				operator.report({'WARNING'}, "first texture slot in first material isn't of type IMAGE or it's not unwrapped, texture ignored")
+				#continue without texture
+
+		meshname = mesh.name
+		mesh.update(calc_tessface=True) # tesselate n-polygons to triangles & quads
+		with profiler.span("seam split", mesh=mesh.name):
+			indices, newverts, uvlist = _splitseams(mesh, textures, uvepsilon)
+			if textures and atlas and obj.name in atlas.rects:
+				uvlist = atlas.uvlist(obj, uvlist)
+				textures = atlas.textures
+				texnames = list(atlas.texnames)
+		realFaceCount = len(indices) // 3 # real face count (triangles)
+
+		# abort when no triangles as it crashs g3dviewer
+		if realFaceCount == 0:
+			bpy.data.meshes.remove(mesh)
+			profiler.log(0, "ERROR: no triangles found")
+			operator.report({'ERROR'}, "no triangles found")
+			return -1
+		vertexCount = len(mesh.vertices) + len(newverts)
+		specularPower = 9.999999  # unused, same as old exporter
+		properties = 0
+		if mesh.g3d_customColor:
+			properties |= 1
+			properties |= (255 - mesh.teamcolor_alpha) << 24
+		if mesh.show_double_sided:
+			properties |= 2
+		if mesh.g3d_noSelect:
+			properties |= 4
+		if mesh.g3d_glow:
+			properties |= 8
+		
+		if mesh.g3d_fullyOpaque:
+			opacity = 1.0
+		bpy.data.meshes.remove(mesh)
+
+		writer = G3DMeshWriter(meshname, frameCount, vertexCount, indices, newverts, uvlist,
+			diffuseColor, specularColor, specularPower, opacity, properties, textures, texnames)
+		if optimize:
+			with profiler.span("vertex cache", mesh=meshname):
+				acmr, atvr, newacmr, newatvr = writer.optimize()
+			profiler.log(1, "%s: ACMR %.3f -> %.3f, ATVR %.3f -> %.3f" % (meshname, acmr, newacmr, atvr, newatvr))
+		writers.append((obj, writer))
+		yield ("meshes", count + 1, len(meshobjs))
+	return 0
+
+def _packframe(writer, frame, vertices, normals):
+	with profiler.span("frame pack", frame=frame, mesh=writer.meshname):
+		writer.addframe(frame, vertices, normals)
+
+class StaticCheck:										 #Finds the Meshes which don't move over the animation
+	#Frame 0 of every Mesh is kept, the frames matching it aren't packed. When a later frame differs
+	#the Mesh is animated after all and the frames held back are packed as copies of frame 0.
+	#epsilon 0 compares the frames bitwise through a digest, otherwise every coordinate may differ by epsilon
+	def __init__(self, epsilon=0.0):
+		self.epsilon = epsilon
+		self.first = {}			#writer: (digest, vertices, normals) of frame 0
+		self.held = {}			#writer: frames held back, None once the Mesh moved
+
+	def _digest(self, vertices, normals):
+		h = hashlib.sha1(vertices)
+		h.update(normals)
+		return h.digest()
+
+	def check(self, writer, frame, vertices, normals):
+		#Returns the (frame, vertices, normals) which have to be packed now
+		held = self.held.get(writer, [])
+		if held is None:
+			return [(frame, vertices, normals)]
+		if frame == 0:
+			self.first[writer] = (self._digest(vertices, normals) if not self.epsilon else None,
+				array.array("f", vertices), array.array("f", normals))
+			self.held[writer] = []
+			return [(frame, vertices, normals)]
+		digest, firstvertices, firstnormals = self.first[writer]
+		if self.epsilon:
+			same = (max(map(abs, map(sub, vertices, firstvertices)), default=0.0) <= self.epsilon and
+				max(map(abs, map(sub, normals, firstnormals)), default=0.0) <= self.epsilon)
+		else:
+			same = self._digest(vertices, normals) == digest
+		if same:
+			held.append(frame)
+			return []
+		self.held[writer] = None
+		del self.first[writer]
+		return [(f, array.array("f", firstvertices), array.array("f", firstnormals)) for f in held] + [(frame, vertices, normals)]
+
+	def static(self):
+		return [writer for writer, held in self.held.items() if held is not None]
+
+def _evaluateframes(context, writers, toglest, operator, staticcheck=None):
+	#Step generator stepping the timeline once per frame and evaluating every Mesh at it. The packing runs
+	#right here too, it's Python bound and holds the GIL so a thread pool only adds queueing
+	frameCount = context.scene.frame_end - context.scene.frame_start + 1
+	fcurrent = context.scene.frame_current
+	try:
+		for frame, i in enumerate(range(context.scene.frame_start, context.scene.frame_end+1)):
+			with profiler.span("frame set", frame=i):
+				context.scene.frame_set(i)
+			for obj, writer in writers:
+				with profiler.span("frame evaluation", frame=i, mesh=writer.meshname):
+					#FIXME: not sure what's better: PREVIEW or RENDER settings
+					m = obj.to_mesh(context.scene, True, 'RENDER')
+					m.transform(obj.matrix_world)  # apply object-mode transformations
+
+					if toglest:
+						# rotate from blender to glest orientation
+						m.transform( Matrix( ((1,0,0,0),(0,0,1,0),(0,-1,0,0),(0,0,0,1)) ) )
+						# transform normals too
+						m.calc_normals()
+
+					if len(m.vertices) + len(writer.newverts) != writer.vertexCount:
+						bpy.data.meshes.remove(m)
+						profiler.log(0, "ERROR: modifiers change the vertex count, apply them first")
+						operator.report({'ERROR'}, "modifiers change the vertex count, apply them first")
+						return -1
+
+					vertices = _framedata(m, "co")
+					normals = _framedata(m, "normal")
+					bpy.data.meshes.remove(m)
+				if staticcheck and not obj.data.g3d_keepAnimated:
+					packs = staticcheck.check(writer, frame, vertices, normals)
+				else:
+					packs = [(frame, vertices, normals)]
+				for packframe, vertices, normals in packs:
+					_packframe(writer, packframe, vertices, normals)
+			yield ("frames", frame + 1, frameCount)
+	finally:
+		context.scene.frame_set(fcurrent)
+	if staticcheck:
+		for writer in staticcheck.static():
+			if writer.frameCount > 1:
+				profiler.log(1, "%s doesn't move, written with 1 frame instead of %d" % (writer.meshname, writer.frameCount))
+				writer.makestatic()
+	return 0
+
+
+#---=== Register ===
+class G3DPanel(bpy.types.Panel):
+	#bl_idname = "OBJECT_PT_G3DPanel"
+	bl_label = "G3D properties"
+	bl_space_type = 'PROPERTIES'
+	bl_region_type = 'WINDOW'
+	bl_context = "data"
+	@classmethod
+	def poll(cls, context):
+		return (context.object is not None and context.object.type == 'MESH')
+
+	def draw(self, context):
+		self.layout.prop(context.object.data, "g3d_customColor")
+		col = self.layout.column()
+		col.prop(context.object.data, "teamcolor_alpha")
+		col.enabled = context.object.data.g3d_customColor
+		self.layout.prop(context.object.data, "show_double_sided", text="double sided")
+		self.layout.prop(context.object.data, "g3d_noSelect")
+		self.layout.prop(context.object.data, "g3d_fullyOpaque")
+		self.layout.prop(context.object.data, "g3d_glow")
+		self.layout.prop(context.object.data, "g3d_keepAnimated")
+
+def _verbosityproperty():
+	return bpy.props.EnumProperty(
+				name="console output",
+				description="How much is printed to the console, printing is slow on big files",
+				items=(('0', "errors", "Errors and warnings only"),
+					('1', "progress", "Files, results and where the time went"),
+					('2', "details", "Also the headers of every mesh")),
+				default='1')
+
+def _traceproperty():
+	return bpy.props.EnumProperty(
+				name="timeline",
+				description="Write the timing spans next to the file",
+				items=(('NONE', "none", "Don't write a timeline"),
+					('JSON', "JSON", "name.profile.json with every span and the totals per span name"),
+					('CHROME', "Chrome trace", "name.trace.json for chrome://tracing or Perfetto")),
+				default='NONE')
+
+def _backgroundproperty():
+	return bpy.props.BoolProperty(
+				name="in background",
+				description="Work in small steps with a progress bar while Blender stays responsive, Esc cancels",
+				default=True)
+
+class G3DModalSteps:										 #Runs a step generator from a timer, Blender stays responsive and Esc cancels
+	#Mixed into the operators, execute hands the steps to runsteps. Every timer tick advances them for a slice
+	#of time, waiting for no worker, and shows the stage, the progress and the time left of the stage.
+	#A run keeps its state in the module globals imported and profiler, so while one is active no other
+	#G3D import or export may start, poll greys them out
+	timeslice = 0.05
+	active = None						#the operator whose steps are running
+
+	@classmethod
+	def poll(cls, context):
+		return G3DModalSteps.active is None
+
+	def runsteps(self, context, steps):
+		if G3DModalSteps.active is not None:
+			steps.close()
+			self.report({'ERROR'}, "another G3D import or export is running")
+			return {'CANCELLED'}
+		G3DModalSteps.active = self
+		self._steps = steps
+		self._step = None
+		self._stage = None
+		wm = context.window_manager
+		self._timer = wm.event_timer_add(0.01, context.window)
+		wm.progress_begin(0, 1000)
+		wm.modal_handler_add(self)
+		return {'RUNNING_MODAL'}
+
+	def modal(self, context, event):
+		if event.type == 'ESC':
+			self.cancel(context)
+			self.report({'WARNING'}, "cancelled")
+			return {'CANCELLED'}
+		if event.type != 'TIMER':
+			return {'PASS_THROUGH'}
+		deadline = time.perf_counter() + self.timeslice
+		try:
+			while time.perf_counter() < deadline:
+				if isinstance(self._step, Future) and not self._step.done():
+					break
+				self._step = next(self._steps)
+				if isinstance(self._step, tuple):
+					self._progress(context, *self._step)
+		except StopIteration as stop:
+			self._endsteps(context)
+			return self.finished(context, stop.value)
+		except:
+			import traceback
+			traceback.print_exc()
+
+			self.cancel(context)
+			return {'CANCELLED'}
+		return {'RUNNING_MODAL'}
+
+	def cancel(self, context):
+		# also called by Blender when the operator is stopped from outside
+		self._steps.close()				#runs the finally blocks of the steps, they remove partial files
+		self._endsteps(context)
+		self.cleanup(context)
+
+	def cleanup(self, context):
+		pass
+
+	def finished(self, context, result):
+		return {'FINISHED'}
+
+	def _endsteps(self, context):
+		G3DModalSteps.active = None
+		wm = context.window_manager
+		wm.event_timer_remove(self._timer)
+		wm.progress_end()
+		if context.area:
+			context.area.header_text_set()
+
+	def _progress(self, context, stage, done, total):
+		now = time.perf_counter()
+		if stage != self._stage:
+			self._stage, self._stagestart = stage, now
+		if not total:
+			text = "%s %d" % (stage, done)
+		else:
+			text = "%s %d/%d" % (stage, done, total)
+			if done:
+				text += ", %.0fs left" % ((now - self._stagestart) / done * (total - done))
+			context.window_manager.progress_update(1000 * done // total)
+		if context.area:
+			context.area.header_text_set(text + ", Esc cancels")
+
+_DATABLOCKS = ("objects", "meshes", "actions", "materials", "textures", "images")
+
+def _datablocknames():
+	return dict((collection, set(getattr(bpy.data, collection).keys())) for collection in _DATABLOCKS)
+
+def _removedatablocks(existing):
+	#Remove what was created since _datablocknames returned existing, in the order their users go away
+	scene = bpy.context.scene
+	for collection in _DATABLOCKS:
+		datablocks = getattr(bpy.data, collection)
+		for datablock in [datablock for datablock in datablocks if datablock.name not in existing[collection]]:
+			if collection == "objects" and datablock.name in scene.objects:
+				scene.objects.unlink(datablock)
+			if collection == "meshes" and datablock.shape_keys:
+				datablock.shape_keys.animation_data_clear()		#the shape keys outlive the mesh and keep their action
+			if datablock.users == 0:
+				datablocks.remove(datablock)
+
+class ImportG3D(bpy.types.Operator, ImportHelper, G3DModalSteps):
+	'''Load a G3D file'''
+	bl_idname = "importg3d.g3d"
+	bl_label = "Import G3D"
+
+	filename_ext = ".g3d"
+	filter_glob = StringProperty(default="*.g3d", options={'HIDDEN'})
+
+	toblender = bpy.props.BoolProperty(
+				name="rotate to Blender orientation",
+				description="Rotate meshes from Glest to Blender orientation",
+				default=True)
+	verbosity = _verbosityproperty()
+	trace = _traceproperty()
+	background = _backgroundproperty()
+
+	def execute(self, context):
+		if self.background and context.window and not bpy.app.background:
+			self._existing = _datablocknames()
+			return self.runsteps(context, G3DLoaderSteps(self.filepath, self.toblender, self, int(self.verbosity), self.trace,
+				background=True))
+		try:
+			G3DLoader(self.filepath, self.toblender, self, int(self.verbosity), self.trace)
+		except:
+			import traceback
+			traceback.print_exc()
+
+			return {'CANCELLED'}
+
+		return {'FINISHED'}
+
+	def cleanup(self, context):
+		# remove the Objects, Meshes and materials of the cancelled import
+		_removedatablocks(self._existing)
+
+class ImportG3DMultiple(bpy.types.Operator, ImportHelper):
+	'''Load several G3D files, decoding them in parallel'''
+	bl_idname = "importg3d.g3d_multiple"
+	bl_label = "Import G3D Files"
+
+	@classmethod
+	def poll(cls, context):
+		return G3DModalSteps.poll(context)
+
+	filename_ext = ".g3d"
+	filter_glob = StringProperty(default="*.g3d", options={'HIDDEN'})
+	files = bpy.props.CollectionProperty(type=bpy.types.OperatorFileListElement, options={'HIDDEN', 'SKIP_SAVE'})
+	directory = StringProperty(subtype='DIR_PATH')
+
+	toblender = bpy.props.BoolProperty(
+				name="rotate to Blender orientation",
+				description="Rotate meshes from Glest to Blender orientation",
+				default=True)
+	recursive = bpy.props.BoolProperty(
+				name="whole directory",
+				description="Import every .g3d file in the directory and its subdirectories",
+				default=False)
+	workers = bpy.props.IntProperty(
+				name="decode processes",
+				description="Number of processes decoding files, 0 uses one per CPU",
+				default=0,
+				min=0, max=64)
+	verbosity = _verbosityproperty()
+	trace = _traceproperty()
+
+	def execute(self, context):
+		if self.recursive:
+			filepaths = sorted(os.path.join(root, f) for root, dirs, files in os.walk(self.directory)
+				for f in files if f.lower().endswith(".g3d"))
+		else:
+			filepaths = [os.path.join(self.directory, f.name) for f in self.files if f.name]
+		if not filepaths:
+			self.report({'ERROR'}, "no .g3d files selected")
+			return {'CANCELLED'}
+		try:
+			G3DMultiLoader(filepaths, self.toblender, self, self.workers or None, int(self.verbosity), self.trace)
+		except:
+			import traceback
+			traceback.print_exc()
+
+			return {'CANCELLED'}
+
+		return {'FINISHED'}
+
+class ImportG3DArchive(bpy.types.Operator, ImportHelper):
+	'''Load every G3D file of a zip or tar archive without extracting it'''
+	bl_idname = "importg3d.g3d_archive"
+	bl_label = "Import G3D Archive"
+
+	@classmethod
+	def poll(cls, context):
+		return G3DModalSteps.poll(context)
+
+	filename_ext = ".zip"
+	filter_glob = StringProperty(default="*.zip;*.tar;*.tar.gz;*.tgz;*.tar.bz2", options={'HIDDEN'})
+
+	toblender = bpy.props.BoolProperty(
+				name="rotate to Blender orientation",
+				description="Rotate meshes from Glest to Blender orientation",
+				default=True)
+	verbosity = _verbosityproperty()
+	trace = _traceproperty()
+
+	def execute(self, context):
+		try:
+			G3DArchiveLoader(self.filepath, self.toblender, self, int(self.verbosity), self.trace)
+		except:
+			import traceback
+			traceback.print_exc()
+
+			return {'CANCELLED'}
+
+		return {'FINISHED'}
+
+class ExportG3D(bpy.types.Operator, ExportHelper, G3DModalSteps):
+	'''Save a G3D file'''
+	bl_idname = "exportg3d.g3d"
+	bl_label = "Export G3D"
+
+	filename_ext = ".g3d"
+	filter_glob = StringProperty(default="*.g3d", options={'HIDDEN'})
+
+	#export options
+	showg3d = bpy.props.BoolProperty(
+				name="show G3D afterwards",
+				description=("Run g3dviewer to show G3D after export. "
+							"g3dviewer needs to be in the scripts directory, "
+							"otherwise the associated program of .g3d is run."),
+				default=False)
+	toglest = bpy.props.BoolProperty(
+				name="rotate to glest orientation",
+				description="Rotate meshes from Blender to Glest orientation",
+				default=True)
+	uvepsilon = bpy.props.FloatProperty(
+				name="UV merge distance",
+				description=("Texcoords of a vertex closer than this are merged "
+							"instead of duplicating the vertex, 0 merges exact matches only"),
+				default=0.0,
+				min=0.0, max=0.01, precision=6)
+	version = bpy.props.EnumProperty(
+				name="G3D version",
+				description="Format version to write",
+				items=(('4', "4", "Uncompressed, loads everywhere"),
+					('5', "5 (compressed)", "Quantised frame deltas and 16 bit normals, much smaller animated meshes, "
+						"needs a loader with version 5 support, encoding and loading are done in Python and take "
+						"about 3 s and 1.3 s per million vertex frames")),
+				default='4')
+	optimize = bpy.props.BoolProperty(
+				name="optimize for vertex cache",
+				description=("Reorder triangles and vertices for the GPU vertex cache, "
+							"prints ACMR and ATVR before and after"),
+				default=False)
+	lods = bpy.props.IntProperty(
+				name="LOD levels",
+				description=("Number of simplified levels of detail written next to the model "
+							"as name_lod1.g3d, name_lod2.g3d and so on"),
+				default=0, min=0, max=8)
+	lodratio = bpy.props.FloatProperty(
+				name="LOD ratio",
+				description="Fraction of the triangles kept by each level relative to the previous one",
+				default=0.5, min=0.05, max=0.95)
+	verbosity = _verbosityproperty()
+	trace = _traceproperty()
+	static = bpy.props.BoolProperty(
+				name="single frame for static meshes",
+				description=("Meshes which don't move over the frame range are written with one frame, "
+							"\"always animated\" in the G3D properties of a mesh keeps all its frames"),
+				default=True)
+	staticepsilon = bpy.props.FloatProperty(
+				name="static tolerance",
+				description="Largest coordinate change still counted as not moving, 0 compares the frames bitwise",
+				default=0.0,
+				min=0.0, max=0.01, precision=6)
+	incremental = bpy.props.BoolProperty(
+				name="incremental",
+				description=("Reuse the meshes which didn't change since the last export to this file, "
+							"kept track of in name.g3d.cache.json"),
+				default=False)
+	keyerror = bpy.props.FloatProperty(
+				name="keyframe tolerance",
+				description=("Drop the frames which are the linear interpolation of their neighbours to within this distance, "
+							"the engine interpolates them again. 0 writes every frame, needs version 5"),
+				default=0.0,
+				min=0.0, max=1.0, precision=4)
+	bounds = bpy.props.BoolProperty(
+				name="bounding volumes",
+				description=("Write the bounding box and sphere of every mesh and of every frame, "
+							"needs version 5"),
+				default=False)
+	atlas = bpy.props.BoolProperty(
+				name="texture atlas",
+				description=("Pack the images of all meshes into name_atlas.png, name_atlas_specular.png and "
+							"name_atlas_normal.png so they share one texture, meshes with tiling texcoords keep theirs"),
+				default=False)
+	atlaspadding = bpy.props.IntProperty(
+				name="atlas padding",
+				description="Pixels of repeated edge around every image in the atlas, against bleeding when filtering",
+				default=4, min=0, max=64)
+	merge = bpy.props.BoolProperty(
+				name="merge meshes",
+				description=("Write the meshes with the same G3D properties, material, textures and frame count "
+							"as one mesh, fewer draw calls in the engine"),
+				default=False)
+	background = _backgroundproperty()
+
+	def _arguments(self, context):
+		return (self.filepath, context, self.toglest, self, self.uvepsilon, int(self.version), self.optimize,
+			self.lods, self.lodratio, int(self.verbosity), self.trace, self.incremental,
+			self.static, self.staticepsilon, self.keyerror, self.bounds, self.atlas, self.atlaspadding,
+			self.merge)
+
+	def execute(self, context):
+		if self.background and context.window and not bpy.app.background:
+			#the context passed to execute doesn't stay valid over the timer ticks, bpy.context does
+			return self.runsteps(context, G3DSaverSteps(*self._arguments(bpy.context)))
+		try:
+			res = G3DSaver(*self._arguments(context))
+			if res==0 and self.showg3d:
+				self._showg3d()
+		except:
+			import traceback
+			traceback.print_exc()
+
+			return {'CANCELLED'}
+
+		return {'FINISHED'}
+
+	def finished(self, context, res):
+		if res==0 and self.showg3d:
+			self._showg3d()
+		return {'FINISHED'}
+
+	def _showg3d(self):
+		print("opening g3dviewer with " + self.filepath)
+		scriptsdir = bpy.utils.script_path_user()
+		dname = os.path.dirname(self.filepath)
+		found = False
+		for f in os.listdir(scriptsdir):
+			if "g3dviewer" in f:
+				f = os.path.join(scriptsdir, f)
+				if os.path.isfile(f) and os.access(f, os.X_OK):
+					cmd = [f, self.filepath]
+					print(cmd)
+					subprocess.Popen(cmd, cwd=dname)
+					found = True
+
+		# try default associated program
+		if not found:
+			if os.name == 'posix':
+				# xdg-open is only a shell script which delegates the job to a
+				# desktop specific program, e.g. if DE=kde than kde-open
+				# needs DE environment variable set, otherwise it just throws it
+				# at the browser, which is not very helpful
+				print("running xdg-open "+self.filepath)
+				subprocess.Popen(['xdg-open', self.filepath], cwd=dname)
+			elif os.name == 'mac':
+				subprocess.Popen(['open', self.filepath], cwd=dname)
+			elif os.name == 'nt':
+				#os.startfile(self.filepath) # no way to change dir
+				subprocess.Popen(['cmd', '/C', 'start', self.filepath], cwd=dname)
+
+def menu_func_import(self, context):
+	self.layout.operator(ImportG3D.bl_idname, text="Glest 3D File (.g3d)")
+	self.layout.operator(ImportG3DMultiple.bl_idname, text="Glest 3D Files, parallel (.g3d)")
+	self.layout.operator(ImportG3DArchive.bl_idname, text="Glest 3D Archive (.zip/.tar)")
+
+def menu_func_export(self, context):
+	self.layout.operator(ExportG3D.bl_idname, text="Glest 3D File (.g3d)")
+
+def register():
+	# custom mesh properties
+	bpy.types.Mesh.g3d_customColor = bpy.props.BoolProperty(
+			name="team color",
+			description="replace alpha channel of texture with team color")
+	bpy.types.Mesh.g3d_noSelect = bpy.props.BoolProperty(
+			name="non-selectable",
+			description="click on mesh doesn't select unit")
+	bpy.types.Mesh.g3d_fullyOpaque = bpy.props.BoolProperty(
+			name="fully opaque",
+			description="sets opacity to 1.0, ignoring what's set in materials")
+	bpy.types.Mesh.g3d_glow = bpy.props.BoolProperty(
+			name="glow",
+			description="let objects glow like particles")
+	bpy.types.Mesh.g3d_keepAnimated = bpy.props.BoolProperty(
+			name="always animated",
+			description="write every frame even if the mesh doesn't move, otherwise static meshes get a single frame")
+	bpy.types.Mesh.teamcolor_alpha = bpy.props.IntProperty(
+			name="team color alpha",
+			description="set the transparency of the teamcolor part of the texture only",
+			default=0,
+			min=0, max=2**8-1)
+
+	bpy.utils.register_module(__name__)
+
+	bpy.types.INFO_MT_file_import.append(menu_func_import)
+	bpy.types.INFO_MT_file_export.append(menu_func_export)
+
+
+def unregister():
+	bpy.utils.unregister_module(__name__)
+
+	bpy.types.INFO_MT_file_import.remove(menu_func_import)
+	bpy.types.INFO_MT_file_export.remove(menu_func_export)
+
+###########################################################################
+# Batch conversion
+###########################################################################
+# Converts many files in one Blender session, e.g.
+#   blender --background --factory-startup --python io_g3d/__init__.py -- export units/*.blend --outdir build --report report.json
+#   blender --background --factory-startup --python io_g3d/__init__.py -- import --manifest models.txt --jobs 4
+# export writes a .g3d for every .blend, import writes a .blend for every .g3d.
+# A manifest lists one input per line, empty lines and lines starting with # are skipped.
+# With --jobs N the inputs are split over N background Blender processes.
+class BatchReporter:										 #Stands in for the operator, collecting its reports
+	def __init__(self):
+		self.messages = []
+
+	def report(self, type, message):
+		self.messages.append("%s: %s" % ("/".join(sorted(type)), message))
+
+def _batchinputs(args):
+	inputs = []
+	if args.manifest:
+		with open(args.manifest) as manifest:
+			for line in manifest:
+				line = line.strip()
+				if line and not line.startswith("#"):
+					inputs.append(line)
+	for pattern in args.inputs:
+		matches = sorted(glob.glob(pattern))
+		inputs.extend(matches if matches else [pattern])
+	return inputs
+
+def _batchoutput(args, inputpath):
+	ext = ".g3d" if args.mode == "export" else ".blend"
+	outputpath = os.path.splitext(inputpath)[0] + ext
+	if args.outdir:
+		outputpath = os.path.join(args.outdir, os.path.basename(outputpath))
+	return outputpath
+
+def _clearscene():
+	scene = bpy.context.scene
+	for ob in list(scene.objects):
+		scene.objects.unlink(ob)
+	for ob in list(bpy.data.objects):
+		if ob.users == 0:
+			bpy.data.objects.remove(ob)
+	for mesh in list(bpy.data.meshes):
+		if mesh.users == 0:
+			bpy.data.meshes.remove(mesh)
+
+def _batchconvert(args, inputpath):
+	outputpath = _batchoutput(args, inputpath)
+	reporter = BatchReporter()
+	entry = {"input": inputpath, "output": outputpath}
+	start = time.perf_counter()
+	try:
+		if args.mode == "export":
+			bpy.ops.wm.open_mainfile(filepath=inputpath)
+			res = G3DSaver(outputpath, bpy.context, args.toglest, reporter, args.uvepsilon, args.version, args.optimize,
+				args.lods, args.lodratio, args.verbosity, args.trace, args.incremental,
+				args.static, args.staticepsilon, args.keyerror, args.bounds, args.atlas, args.atlaspadding,
+				args.merge)
+		else:
+			_clearscene()
+			G3DLoader(inputpath, args.toglest, reporter, args.verbosity, args.trace)
+			res = -1 if [m for m in reporter.messages if m.startswith("ERROR")] else 0
+			if res == 0:
+				bpy.ops.wm.save_as_mainfile(filepath=outputpath, copy=True)
+	except Exception:
+		import traceback
+		traceback.print_exc()
+		reporter.messages.append("ERROR: " + traceback.format_exc().strip().splitlines()[-1])
+		res = -1
+	entry["seconds"] = time.perf_counter() - start
+	entry["status"] = "ok" if res == 0 else "error"
+	entry["messages"] = reporter.messages
+	print("%s %s -> %s (%.2fs)" % (entry["status"], inputpath, outputpath, entry["seconds"]))
+	return entry
+
+def _batchfanout(args, inputs):
+	#Split the inputs round robin over background Blender processes and merge their reports
+	procs = []
+	tempdir = tempfile.mkdtemp(prefix="g3dbatch")
+	try:
+		for job in range(args.jobs):
+			chunk = inputs[job::args.jobs]
+			if not chunk:
+				continue
+			manifest = os.path.join(tempdir, "manifest%d.txt" % job)
+			report = os.path.join(tempdir, "report%d.json" % job)
+			with open(manifest, "w") as f:
+				f.write("\n".join(chunk))
+			cmd = [bpy.app.binary_path, "--background", "--factory-startup", "--python", abspath(__file__), "--",
+				args.mode, "--manifest", manifest, "--report", report, "--uv-epsilon", repr(args.uvepsilon),
+				"--g3d-version", str(args.version), "--lods", str(args.lods), "--lod-ratio", repr(args.lodratio),
+				"--verbosity", str(args.verbosity), "--static-epsilon", repr(args.staticepsilon),
+				"--key-error", repr(args.keyerror), "--atlas-padding", str(args.atlaspadding)]
+			if args.trace:
+				cmd += ["--trace", args.trace.lower()]
+			if args.outdir:
+				cmd += ["--outdir", args.outdir]
+			if not args.toglest:
+				cmd.append("--no-rotate")
+			if args.optimize:
+				cmd.append("--optimize")
+			if args.incremental:
+				cmd.append("--incremental")
+			if not args.static:
+				cmd.append("--no-static")
+			if args.bounds:
+				cmd.append("--bounds")
+			if args.atlas:
+				cmd.append("--atlas")
+			if args.merge:
+				cmd.append("--merge")
+			procs.append((subprocess.Popen(cmd), chunk, report))
+		files = []
+		for proc, chunk, report in procs:
+			proc.wait()
+			try:
+				with open(report) as f:
+					files.extend(json.load(f)["files"])
+			except (IOError, ValueError):	#the process died before writing its report
+				files.extend({"input": inputpath, "output": _batchoutput(args, inputpath), "status": "error",
+					"seconds": 0.0, "messages": ["ERROR: blender exited with code %d" % proc.returncode]} for inputpath in chunk)
+		return files
+	finally:
+		shutil.rmtree(tempdir, ignore_errors=True)
+
+def main(argv):
+	import argparse
+	parser = argparse.ArgumentParser(prog="blender --background --python io_g3d/__init__.py --",
+		description="Convert .blend files to .g3d (export) or .g3d files to .blend (import) in one Blender session")
+	parser.add_argument("mode", choices=("export", "import"))
+	parser.add_argument("inputs", nargs="*", help="input files or glob patterns")
+	parser.add_argument("--manifest", help="text file listing one input per line")
+	parser.add_argument("--outdir", help="directory for the output files, default is next to the input")
+	parser.add_argument("--report", help="write a JSON report with timing and status per file")
+	parser.add_argument("--jobs", type=int, default=1, help="number of background Blender processes")
+	parser.add_argument("--no-rotate", dest="toglest", action="store_false",
+		help="don't rotate between Blender and Glest orientation")
+	parser.add_argument("--uv-epsilon", dest="uvepsilon", type=float, default=0.0,
+		help="texcoords closer than this are merged on export")
+	parser.add_argument("--g3d-version", dest="version", type=int, default=4, choices=(4, 5),
+		help="format version to export, 5 compresses the animation frames")
+	parser.add_argument("--optimize", action="store_true",
+		help="reorder triangles and vertices for the vertex cache on export")
+	parser.add_argument("--lods", type=int, default=0, help="number of simplified levels of detail to export")
+	parser.add_argument("--lod-ratio", dest="lodratio", type=float, default=0.5,
+		help="fraction of the triangles kept by each level of detail")
+	parser.add_argument("--verbosity", type=int, default=1, choices=(0, 1, 2),
+		help="0 errors only, 1 progress and timings, 2 every mesh header")
+	parser.add_argument("--trace", type=str.upper, choices=("JSON", "CHROME"),
+		help="write the timing spans of every file as .profile.json or Chrome .trace.json next to it")
+	parser.add_argument("--incremental", action="store_true",
+		help="on export only re-evaluate the meshes which changed since the last export to the same file")
+	parser.add_argument("--no-static", dest="static", action="store_false",
+		help="write every frame of meshes which don't move")
+	parser.add_argument("--static-epsilon", dest="staticepsilon", type=float, default=0.0,
+		help="largest coordinate change of a mesh still counted as not moving")
+	parser.add_argument("--bounds", action="store_true",
+		help="with --g3d-version 5 write the bounding box and sphere of every mesh and of every frame")
+	parser.add_argument("--atlas", action="store_true",
+		help="pack the images of all meshes of a file into one atlas per texture slot")
+	parser.add_argument("--atlas-padding", dest="atlaspadding", type=int, default=4,
+		help="pixels of repeated edge around every image in the atlas")
+	parser.add_argument("--merge", action="store_true",
+		help="write the meshes with the same properties, material, textures and frame count as one mesh")
+	parser.add_argument("--key-error", dest="keyerror", type=float, default=0.0,
+		help="with --g3d-version 5 drop the frames which linear interpolation reproduces to within this distance")
+	args = parser.parse_args(argv)
+
+	inputs = _batchinputs(args)
+	if args.outdir and not os.path.isdir(args.outdir):
+		os.makedirs(args.outdir)
+	start = time.perf_counter()
+	if args.jobs > 1 and len(inputs) > 1:
+		files = _batchfanout(args, inputs)
+	else:
+		files = [_batchconvert(args, inputpath) for inputpath in inputs]
+	failed = len([entry for entry in files if entry["status"] != "ok"])
+	summary = {"mode": args.mode, "seconds": time.perf_counter() - start, "failed": failed, "files": files}
+	print("%d of %d files converted in %.2fs" % (len(files) - failed, len(files), summary["seconds"]))
+	if args.report:
+		with open(args.report, "w") as f:
+			json.dump(summary, f, indent=1)
+	return 1 if failed else 0
+
+if __name__ == '__main__':
+	register()
+	if "--" in sys.argv:
+		sys.exit(main(sys.argv[sys.argv.index("--") + 1:]))
+
+	#for obj in bpy.data.objects:
+	#	if obj.type == 'MESH':
+	#		obj.select = True
+	#		bpy.ops.object.delete()
+	#G3DLoader("import.g3d", True, None)
+
+	#for obj in bpy.context.selected_objects:
+	#	obj.select = False  # deselect everything, so we get it all
+	#G3DSaver("test.g3d", bpy.context)
+
@@ -0,0 +1,1809 @@
+# Glest G3D Model Specification
+#================================
+#1. DATA TYPES
+#================================
+#G3D files use the following data types:
+#uint8: 8 bit unsigned integer
+#uint16: 16 bit unsigned integer
+#uint32: 32 bit unsigned integer
+#float32: 32 bit floating point
+#char: 8 bit ASCII character
+#================================
+#2. OVERALL STRUCTURE
+#================================
+#- File Header
+#- Model Header
+#- Then for every mesh in the model:
+#	- Mesh Header
+#	- Texture Paths
+#	- Mesh Data
+#================================
+#3. FILE HEADER
+#================================
+#struct FileHeader {
+#   uint8 id[3];
+#   uint8 version;
+#}
+#This header is shared among all the versions of G3D, it identifies this file as a G3D model and provides information of the version.
+#id: must be "G3D"
+#version: must be 4, in binary (not '4'), or 5 for the compressed variant described in 8.
+#================================
+#4. MODEL HEADER
+#================================
+#struct ModelHeader {
+#   uint16 meshCount;
+#   uint8 type;
+#}
+#meshCount: number of meshes in this model
+#type: must be 0
+#
+#There is a mesh header for each mesh, represented by meshCount. The headers are not consecutive, texture paths and mesh data are stored in between.
+#================================
+#5. MESH HEADER
+#================================
+#struct MeshHeader {
+#   char name[64];
+#   uint32 frameCount;
+#   uint32 vertexCount;
+#   uint32 indexCount;
+#   float32 diffuseColor[3];
+#   float32 specularColor[3];
+#   float32 specularPower;
+#   float32 opacity;
+#   MeshPropertyFlag properties;
+#   MeshTexture textures;
+#}
+#name: name of the mesh
+#frameCount: number of keyframes in this mesh
+#vertexCount: number of vertices in each frame
+#indexCount: number of indices in this mesh (the number of triangles is indexCount/3)
+#diffuseColor: RGB diffuse color (material hue)
+#specularColor: RGB specular color
+#specularPower: specular power
+#properties: property flags
+#enum MeshPropertyFlag : uint32 {
+#		mpfNone = 0, #no property is specified
+#		mpfCustomColor = 1, #alpha in this model is replaced by a custom color, usually the player color
+#		mpfTwoSided = 2, #meshes in this mesh are rendered by both sides, if this flag is not present only "counter clockwise" faces are rendered (culling)
+#		mpfNoSelect = 4, #whether the model is selectable
+#		mpfGlow = 8 #whether the model has a glow effect
+#}
+#The last 8 bits (little endian) of properties are used for teamcolor transparency, where 0 is opaque, and 255 is fully transparent team color. The value is inverted for compatibility with megaglest
+#textures: texture flags
+#enum MeshTexture : uint32 {
+#		mtNone = 0, #no texture is specified
+#		mtDiffuse = 1, #the diffuse (regular) texture for the mesh. The texture can have up to 4 byte channels (ARGB)
+#		mtSpecular = 2, #the specular highlight texture for the mesh material. The texture must have a single byte channel (ignored in ZetaGlest)
+#		mtNormal = 4 #the normal texture map for the mesh. The texture must have 3 byte channels, RGB, which map to x, y, z normal coords (ignored in ZetaGlest)
+#}
+#================================
+#6. TEXTURE PATHS
+#================================
+#A list of (max 3) char[64] texture paths, one for each corresponding texture flag in the mesh.
+#If there are no textures in the mesh, no texture paths are present.
+#================================
+#7. MESH DATA
+#================================
+#After each mesh header and texture paths, the mesh data is placed:
+#vertices: frameCount * vertexCount * 3, float32 values representing the x, y, z vertex coords for all frames
+#normals: frameCount * vertexCount * 3, float32 values representing the x, y, z normal coords for all frames
+#texture coords: vertexCount * 2, float32 values representing the s, t tex coords for all frames (only present if the mesh has at least 1 texture)
+#indices: indexCount, uint32 values representing the indices. Every 3 consecutive indices represent a triangle
+#================================
+#8. VERSION 5
+#================================
+#Version 5 has the same model header, mesh header and texture paths as version 4. After the texture paths of each mesh:
+#   uint32 extensionSize;
+#   uint8 extensions[extensionSize];
+#   uint32 encoding;
+#extensions: a list of tagged chunks, each one is char tag[4], uint32 size and size bytes of data. Readers skip the tags they don't know
+#encoding: 0 means the mesh data follows exactly as in version 4, 1 means it is compressed as below
+#
+#Compressed mesh data:
+#   float32 boxMin[3];
+#   float32 boxSize[3];
+#   float32 firstFrame[vertexCount * 3];
+#   uint32 vertexDeltaSize;
+#   uint8 vertexDeltas[vertexDeltaSize];
+#   uint32 normalSize;
+#   uint8 normals[normalSize];
+#followed by the texture coords and the indices, as in version 4.
+#boxMin, boxSize: axis aligned bounding box of all the frames of the mesh
+#firstFrame: the vertices of frame 0, uncompressed
+#vertexDeltas: a zlib stream of frames 1 to frameCount-1. Every coordinate is quantised to uint16 q = round((v - boxMin) / boxSize * 65535)
+#	and stored as the difference to the same coordinate of the previous frame, modulo 65536. Frame 1 is coded against zero.
+#	The uint16 values of every frame are split in byte planes: first the low bytes of all vertexCount * 3 values, then the high bytes.
+#	Decoding is v = boxMin + q * boxSize / 65535, an axis with boxSize 0 decodes to boxMin
+#normals: a zlib stream of the normals of all frames as octahedral unit vectors, 2 uint16 per normal, u = round((x * 0.5 + 0.5) * 65535)
+#	where x, y is the normal divided by |x| + |y| + |z| and, if z < 0, folded to ((1 - |y|) * sign(x), (1 - |x|) * sign(y)).
+#	They are delta coded per frame and split in byte planes like the vertices, frame 0 is coded against zero.
+#	Decoding is x, y = u / 65535 * 2 - 1, z = 1 - |x| - |y|, unfolding x, y when z < 0 (sign(0) is 1), then normalising (x, y, z)
+#
+#Extension chunks:
+#FTIM: uint32 time[frameCount], the frame of the animation every stored frame belongs to, counted from 0 and increasing.
+#	Meshes with keyframe reduction only keep the frames which can't be linearly interpolated from their neighbours,
+#	the frames between two stored ones are the linear interpolation of them. Without the chunk frame i is at time i
+#BNDS: float32 bounds[(frameCount + 1) * 10], the bounds of the whole animation and then of every frame, each one as
+#	boxMin[3], boxMax[3], center[3], radius. The sphere is centered on the box, the one of the whole animation encloses those of the frames
+###########################################################################
+# Standalone codec for the G3D format, it has no Blender dependency so it
+# can be used and benchmarked outside of Blender:
+#   python g3d.py bench --sizes 1000 100000 1000000
+#   python g3d.py scan data/ --csv assets.csv
+# The Blender add-on in __init__.py builds its import and export on top of it.
+###########################################################################
+import sys, struct, array, mmap, os, math, zlib, heapq
+import shutil, tempfile, threading
+import contextlib, json, time
+from itertools import chain, repeat, compress
+from operator import itemgetter, add, sub, mul, truediv
+from collections import deque
+
+SUPPORTED_VERSIONS = (3, 4, 5)
+###########################################################################
+# Declaring Structures of G3D Format
+###########################################################################
+class G3DHeader:							#Read first 4 Bytes of file should be G3D + Versionnumber
+	binary_format = "<3cB"
+	def __init__(self, fileID):
+		temp = fileID.read(struct.calcsize(self.binary_format))
+		data = struct.unpack(self.binary_format,temp)
+		self.id = str(data[0]+data[1]+data[2], "utf-8")
+		self.version = data[3]
+
+class G3DModelHeaderv3:					 #Read Modelheader in V3 there is only the number of Meshes in file
+	binary_format = "<I"
+	def __init__(self, fileID):
+		temp = fileID.read(struct.calcsize(self.binary_format))
+		data = struct.unpack(self.binary_format,temp)
+		self.meshcount = data[0]
+
+class G3DModelHeaderv4:					 #Read Modelheader: Number of Meshes and Meshtype (must be 0)
+	binary_format = "<HB"
+	def __init__(self, fileID):
+		temp = fileID.read(struct.calcsize(self.binary_format))
+		data = struct.unpack(self.binary_format,temp)
+		self.meshcount = data[0]
+		self.mtype = data[1]
+		
+class G3DMeshHeaderv3:										 #Read Meshheader
+	binary_format = "<7I64c"
+	def __init__(self,fileID):
+		temp = fileID.read(struct.calcsize(self.binary_format))
+		data = struct.unpack(self.binary_format,temp)
+		self.framecount = data[0]				 #Framecount = Number of Animationsteps
+		self.normalframecount= data[1]		 #Number of Normal Frames actually equal to Framecount
+		self.texturecoordframecount= data[2]#Number of Frames of Texturecoordinates seems everytime to be 1
+		self.colorframecount= data[3]		  #Number of Frames of Colors seems everytime to be 1
+		self.vertexcount= data[4]				  #Number of Vertices in each Frame
+		self.indexcount= data[5]					   #Number of Indices in Mesh (Triangles = Indexcount/3)
+		self.properties= data[6]					   #Property flags
+		if self.properties & 1:					  #PropertyBit is Mesh Textured ?
+			self.hastexture = False
+			self.diffusetexture = None
+		else:
+			self.diffusetexture = "".join([str(x, "ascii") for x in data[7:-1] if x[0]< 127 ])
+			self.hastexture = True
+		if self.properties & 2:					  #PropertyBit is Mesh TwoSided ?
+			self.istwosided = True
+		else:
+			self.istwosided = False
+		if self.properties & 4:					  #PropertyBit is Mesh Alpha Channel custom Color in Game ?
+			self.customalpha = True
+		else:
+			self.customalpha = False
+
+class G3DMeshHeaderv4:										 #Read Meshheader
+	binary_format = "<64c3I8f2I"
+	texname_format = "<64c"
+
+	def _readtexname(self,fileID):
+		temp = fileID.read(struct.calcsize(self.texname_format))
+		data = struct.unpack(self.texname_format,temp)
+		return "".join([str(x, "ascii") for x in data[0:-1] if x[0] < 127 ])
+
+	def __init__(self,fileID):
+		temp = fileID.read(struct.calcsize(self.binary_format))
+		data = struct.unpack(self.binary_format,temp)
+		self.meshname = "".join([str(x, "ascii") for x in data[0:64] if x[0] < 127 ]) #Name of Mesh every Char is a  String on his own
+		self.framecount    = data[64]      #Framecount = Number of Animationsteps
+		self.vertexcount   = data[65]      #Number of Vertices in each Frame
+		self.indexcount    = data[66]      #Number of Indices in Mesh (Triangles = Indexcount/3)
+		self.diffusecolor  = data[67:70]   #RGB diffuse color
+		self.specularcolor = data[70:73]   #RGB specular color (unused)
+		self.specularpower = data[73]      #Specular power (unused)
+		self.opacity       = data[74]      #Opacity
+		self.properties    = data[75]      #Property flags
+		self.textures      = data[76]      #Texture flags
+
+		self.customalpha = bool(self.properties & 1)
+		self.istwosided  = bool(self.properties & 2)
+		self.noselect    = bool(self.properties & 4)
+		self.glow    = bool(self.properties & 8)
+		# Get last 8 bits for teamcolor transparency
+		# The value is inverted for compatibility with megaglest
+		self.teamcoloralpha = 255 - (self.properties >> 24)
+
+
+		self.hastexture = False
+		self.diffusetexture  = None
+		self.speculartexture = None
+		self.normaltexture   = None
+		self.warnings = []						#what the reader skipped, the caller decides whether to show it
+		self.bounds = None						#G3DBounds of the whole animation, from the V5 BNDS chunk
+		self.framebounds = []					#G3DBounds of every frame, from the V5 BNDS chunk
+		if self.textures:						#PropertyBit is Mesh Textured ?
+			if self.textures & 1:  # diffuse
+				self.diffusetexture = self._readtexname(fileID)
+			if self.textures & 2:  # specular
+				self.speculartexture = self._readtexname(fileID)
+			if self.textures & 4:  # normal
+				self.normaltexture = self._readtexname(fileID)
+
+			self.hastexture = True
+			# read all texture slots, otherwise it's read as data
+			tex = self.textures >> 3
+			while tex:
+				tex &= tex - 1 # set rightmost 1-bit to 0
+				# discard texture name, as we don't know what to do with it
+				fileID.seek(struct.calcsize(self.texname_format), 1)
+				self.warnings.append("ignored texture in undefined texture slot")
+		self.extensions = {}
+		self.encoding = 0				#The Datapack is always raw before V5
+
+class G3DMeshHeaderv5(G3DMeshHeaderv4):							#Read Meshheader, texture names, extension chunks and data encoding
+	def __init__(self,fileID):
+		G3DMeshHeaderv4.__init__(self, fileID)
+		size = struct.unpack("<I", fileID.read(4))[0]
+		end = fileID.tell() + size
+		while fileID.tell() + 8 <= end:		#Keep every chunk, the importer picks the tags it knows
+			tag, chunksize = struct.unpack("<4sI", fileID.read(8))
+			self.extensions[str(tag, "ascii")] = fileID.read(chunksize)
+		fileID.seek(end)
+		self.encoding = struct.unpack("<I", fileID.read(4))[0]
+		data = self.extensions.get("BNDS")
+		if data is not None and len(data) == (self.framecount + 1) * G3DBounds.size:
+			bounds = [G3DBounds(struct.unpack_from(G3DBounds.binary_format, data, offset)) for offset in range(0, len(data), G3DBounds.size)]
+			self.bounds, self.framebounds = bounds[0], bounds[1:]
+
+class G3DBounds:											 #Axis aligned box and bounding sphere of a Mesh or of one of its frames
+	binary_format = "<10f"
+	size = struct.calcsize(binary_format)
+
+	def __init__(self, values):
+		self.boxmin = tuple(values[0:3])
+		self.boxmax = tuple(values[3:6])
+		self.center = tuple(values[6:9])
+		self.radius = values[9]
+
+	def pack(self):
+		return struct.pack(self.binary_format, *(self.boxmin + self.boxmax + self.center + (self.radius,)))
+
+def boundsof(vertices):
+	#G3DBounds of a flat x, y, z array, the sphere is centered on the box
+	if not len(vertices):
+		return G3DBounds((0.0,) * 10)
+	xs, ys, zs = vertices[0::3], vertices[1::3], vertices[2::3]
+	boxmin = (min(xs), min(ys), min(zs))
+	boxmax = (max(xs), max(ys), max(zs))
+	cx, cy, cz = center = tuple((a + b) * 0.5 for a, b in zip(boxmin, boxmax))
+	radius = math.sqrt(max(map(lambda x, y, z: (x - cx) ** 2 + (y - cy) ** 2 + (z - cz) ** 2, xs, ys, zs)))
+	return G3DBounds(boxmin + boxmax + center + (radius,))
+
+def enclose(framebounds):
+	#G3DBounds around a list of G3DBounds, the sphere contains all of their spheres
+	boxmin = tuple(min(b.boxmin[axis] for b in framebounds) for axis in range(3))
+	boxmax = tuple(max(b.boxmax[axis] for b in framebounds) for axis in range(3))
+	center = tuple((a + b) * 0.5 for a, b in zip(boxmin, boxmax))
+	radius = max(math.sqrt(sum((a - b) ** 2 for a, b in zip(b.center, center))) + b.radius for b in framebounds)
+	return G3DBounds(boxmin + boxmax + center + (radius,))
+
+def keyframes(header):
+	#The animation frame of every stored frame of a Mesh, from its FTIM chunk or 0, 1, 2... without one
+	times = array.array("I")
+	data = getattr(header, "extensions", {}).get("FTIM")
+	if data is not None and len(data) == header.framecount * 4:
+		times.frombytes(data)
+		if sys.byteorder != "little":
+			times.byteswap()
+		return times
+	return array.array("I", range(header.framecount))
+
+def readblock(fileID, typecode, count):
+	#Read count little endian items in one go and expose them as a flat typed memoryview
+	#instead of unpacking every value into its own Python object
+	size = count * struct.calcsize("<" + typecode)
+	if isinstance(fileID, mmap.mmap):
+		#Slice the mapping directly, the pages are only touched when the view is used
+		offset = fileID.tell()
+		temp = memoryview(fileID)[offset:offset + size]
+		fileID.seek(offset + len(temp))
+	elif isinstance(fileID, G3DBuffer):
+		temp = fileID.view(size)
+	else:
+		temp = fileID.read(size)
+	if len(temp) != size:
+		raise EOFError("G3D mesh data is truncated")
+	if sys.byteorder == "little":
+		return memoryview(temp).cast(typecode)
+	block = array.array(typecode)
+	block.frombytes(temp)
+	block.byteswap()
+	return memoryview(block)
+
+def writeblock(fileID, block):
+	#Counterpart of readblock, writes a typed array little endian
+	if sys.byteorder != "little":
+		block = array.array(block.typecode, block)
+		block.byteswap()
+	fileID.write(block)
+
+class G3DBuffer:											 #Seekable reader over bytes in memory, handing out views instead of copies
+	def __init__(self, data):
+		self._data = memoryview(data)
+		self._pos = 0
+
+	def view(self, size):
+		temp = self._data[self._pos:self._pos + size]
+		self._pos += len(temp)
+		return temp
+
+	def read(self, size=-1):
+		if size < 0:
+			size = len(self._data) - self._pos
+		return self.view(size).tobytes()
+
+	def seek(self, offset, whence=0):
+		if whence == 1:
+			offset += self._pos
+		elif whence == 2:
+			offset += len(self._data)
+		self._pos = max(0, offset)
+		return self._pos
+
+	def tell(self):
+		return self._pos
+
+	def __len__(self):
+		return len(self._data)
+
+	def close(self):
+		pass
+
+class G3DMeshdata:												 #Common accessors of the typed Mesh Datapack
+	#vertexdata and normaldata are flat views laid out as (frames, vertices, 3),
+	#texcoorddata as (vertices, 2) and indexdata as (indices,)
+	def vertexframe(self, frame):
+		stride = self.vertexcount * 3
+		return self.vertexdata[frame * stride:(frame + 1) * stride]
+
+	def normalframe(self, frame):
+		stride = self.vertexcount * 3
+		return self.normaldata[frame * stride:(frame + 1) * stride]
+
+	#Compatibility views, these box every value into a tuple so keep them out of hot paths
+	@property
+	def vertices(self):
+		return tuple(self.vertexdata)
+
+	@property
+	def normals(self):
+		return tuple(self.normaldata)
+
+	@property
+	def texturecoords(self):
+		return tuple(self.texcoorddata)
+
+	@property
+	def indices(self):
+		return tuple(self.indexdata)
+
+class G3DMeshdataV3(G3DMeshdata):									#Calculate and read the Mesh Datapack
+	def __init__(self,fileID,header):
+		self.vertexcount = header.vertexcount
+		#Calculation of the Meshdatasize to load because its variable
+		#Animationframes * Vertices per Animation * 3 (Each Point are 3 Float X Y Z Coordinates)
+		self.vertexdata = readblock(fileID, "f", header.framecount * header.vertexcount * 3)
+		#The same for Normals
+		self.normaldata = readblock(fileID, "f", header.normalframecount * header.vertexcount * 3)
+		#Same here but Textures are 2D so only 2 Floats needed for Position inside Texture Bitmap
+		self.texcoorddata = readblock(fileID, "f", header.texturecoordframecount * header.vertexcount * 2)
+		#Colors in format RGBA
+		self.colordata = readblock(fileID, "f", header.colorframecount * 4)
+		#Indices
+		self.indexdata = readblock(fileID, "I", header.indexcount)
+
+	@property
+	def colors(self):
+		return tuple(self.colordata)
+
+class G3DMeshdataV4(G3DMeshdata):									#Calculate and read the Mesh Datapack
+	def __init__(self,fileID,header):
+		self.vertexcount = header.vertexcount
+		#Calculation of the Meshdatasize to load because its variable
+		#Animationframes * Points (Vertex) per Animation * 3 (Each Point are 3 Float X Y Z Coordinates)
+		self.vertexdata = readblock(fileID, "f", header.framecount * header.vertexcount * 3)
+		#The same for Normals
+		self.normaldata = readblock(fileID, "f", header.framecount * header.vertexcount * 3)
+		#Same here but Textures are 2D so only 2 Floats needed for Position inside Texture Bitmap
+		if header.hastexture:
+			self.texcoorddata = readblock(fileID, "f", header.vertexcount * 2)
+		#Indices
+		self.indexdata = readblock(fileID, "I", header.indexcount)
+
+class G3DMeshdataV5(G3DMeshdataV4):								#Read the Mesh Datapack, decompressing the frames when encoding is 1
+	def __init__(self,fileID,header):
+		if not header.encoding:
+			G3DMeshdataV4.__init__(self, fileID, header)
+			return
+		self.vertexcount = header.vertexcount
+		framesize = header.vertexcount * 3
+		box = readblock(fileID, "f", 6).tolist()
+		boxmin, steps = box[0:3], [size / 65535 for size in box[3:6]]
+		#Frame 0 is stored as it is, the others are rebuilt from their quantised deltas
+		vertexdata = array.array("f")
+		vertexdata.frombytes(readblock(fileID, "f", framesize).cast("B"))
+		deltas = zlib.decompress(fileID.read(struct.unpack("<I", fileID.read(4))[0]))
+		mask = _lanemask(framesize)
+		lanes = 0
+		dequantisers = [_dequantiser(mn, step, header.vertexcount * (header.framecount - 1)) for mn, step in zip(boxmin, steps)]
+		for frame in range(header.framecount - 1):
+			lanes = (lanes + _lanes(deltas, frame * framesize, framesize)) & mask
+			q = _joinplanes(_unlanes(lanes, framesize), 0, framesize)
+			block = array.array("f", bytes(framesize * 4))
+			for axis in range(3):
+				block[axis::3] = array.array("f", map(dequantisers[axis], q[axis::3]))
+			vertexdata.extend(block)
+		deltas = None
+		#Normals of all frames as octahedral pairs
+		packed = zlib.decompress(fileID.read(struct.unpack("<I", fileID.read(4))[0]))
+		normaldata = array.array("f")
+		count = header.vertexcount * 2
+		mask = _lanemask(count)
+		lanes = 0
+		for frame in range(header.framecount):
+			lanes = (lanes + _lanes(packed, frame * count, count)) & mask
+			normaldata.extend(_octdecode(_joinplanes(_unlanes(lanes, count), 0, count)))
+		packed = None
+		self.vertexdata = memoryview(vertexdata)
+		self.normaldata = memoryview(normaldata)
+		if header.hastexture:
+			self.texcoorddata = readblock(fileID, "f", header.vertexcount * 2)
+		self.indexdata = readblock(fileID, "I", header.indexcount)
+
+#Helpers of the V5 frame compression
+def _splitplanes(block):
+	#uint16 array to its low byte plane followed by its high byte plane
+	if sys.byteorder != "little":
+		block = array.array("H", block)
+		block.byteswap()
+	raw = block.tobytes()
+	return raw[0::2] + raw[1::2]
+
+def _joinplanes(data, offset, count):
+	#Inverse of _splitplanes for count values starting at the value offset of data
+	start = offset * 2
+	raw = bytearray(count * 2)
+	raw[0::2] = data[start:start + count]
+	raw[1::2] = data[start + count:start + count * 2]
+	block = array.array("H")
+	block.frombytes(raw)
+	if sys.byteorder != "little":
+		block.byteswap()
+	return block
+
+#The deltas of a whole frame are added or subtracted at once as big ints with every uint16 value in its own
+#32 bit lane, the lanes never carry into each other and masking them is the modulo 65536
+def _lanes(planes, offset, count):
+	#count values in byte planes, starting at the value offset of planes, as an int of 32 bit lanes
+	start = offset * 2
+	lanes = bytearray(count * 4)
+	lanes[0::4] = planes[start:start + count]
+	lanes[1::4] = planes[start + count:start + count * 2]
+	return int.from_bytes(lanes, "little")
+
+def _unlanes(lanes, count):
+	#Inverse of _lanes, back to the low byte plane followed by the high byte plane
+	raw = lanes.to_bytes(count * 4, "little")
+	return raw[0::4] + raw[1::4]
+
+def _lanemask(count):
+	return int.from_bytes(b"\xff\xff\0\0" * count, "little")
+
+def _delta(current, previous, count):
+	#Lanes of current - previous modulo 65536, 65536 is added to every lane first so none goes negative
+	return (current + int.from_bytes(b"\0\0\1\0" * count, "little") - previous) & _lanemask(count)
+
+def _dequantiser(mn, step, count):
+	#Maps a quantised value back to mn + q * step, through a table of all 65536 results when there are more values than that
+	if count > 65536:
+		return array.array("f", map(mn.__add__, map(step.__mul__, range(65536)))).__getitem__
+	return lambda q: mn + q * step
+
+_octtables = None
+
+def _octtable():
+	#x = u / 32767.5 - 1.0, 1 - |x| and sign(x) of every uint16 u, built on first use
+	global _octtables
+	if _octtables is None:
+		xs = list(map((-1.0).__add__, map((32767.5).__rtruediv__, range(65536))))
+		_octtables = xs, list(map((1.0).__sub__, map(abs, xs))), list(_sign(xs))
+	return _octtables
+
+def _sign(values):
+	#1.0 where the value is >= 0.0 else -1.0, so -0.0 counts as positive
+	return map((-1.0).__add__, map((2.0).__mul__, map((0.0).__le__, values)))
+
+def _fold(xs, ys, below):
+	#Octahedral folding of the x, y columns where below is true, (1 - |y|) * sign(x), (1 - |x|) * sign(y).
+	#Every value is picked from the unfolded or the folded column through one index per value
+	count = len(xs)
+	pick = list(map(add, range(count), map(count.__mul__, below)))
+	ax, ay = list(map(abs, xs)), list(map(abs, ys))
+	fx = list(map(mul, map((1.0).__sub__, ay), _sign(xs)))
+	fy = list(map(mul, map((1.0).__sub__, ax), _sign(ys)))
+	return list(map((xs + fx).__getitem__, pick)), list(map((ys + fy).__getitem__, pick))
+
+def _octencode(normals):
+	#Flat x, y, z normals to flat octahedral u, v pairs, a column at a time
+	xs, ys, zs = normals[0::3].tolist(), normals[1::3].tolist(), normals[2::3].tolist()
+	lengths = list(map(add, map(add, map(abs, xs), map(abs, ys)), map(abs, zs)))
+	if 0.0 in lengths:			#degenerate normals, store +z
+		for i in compress(range(len(lengths)), map((0.0).__eq__, lengths)):
+			xs[i], ys[i], zs[i], lengths[i] = 0.0, 0.0, 1.0, 1.0
+	xs = list(map(truediv, xs, lengths))
+	ys = list(map(truediv, ys, lengths))
+	if zs and min(zs) < 0.0:
+		xs, ys = _fold(xs, ys, map((0.0).__gt__, zs))
+	packed = array.array("H", bytes(len(xs) * 4))
+	for column, values in ((0, xs), (1, ys)):
+		packed[column::2] = array.array("H", map(int, map((0.5).__add__, map((65535.0).__mul__, map((0.5).__add__, map((0.5).__mul__, values))))))
+	return packed
+
+def _octdecode(packed):
+	#Flat octahedral u, v pairs to flat x, y, z normals, a column at a time
+	offsets, rests, signs = _octtable()
+	us, vs = packed[0::2], packed[1::2]
+	xs, ys = list(map(offsets.__getitem__, us)), list(map(offsets.__getitem__, vs))
+	zs = list(map(sub, map(rests.__getitem__, us), map(abs, ys)))
+	if zs and min(zs) < 0.0:
+		#Same folding as _fold with 1 - |y| and sign(x) looked up
+		count = len(xs)
+		pick = list(map(add, range(count), map(count.__mul__, map((0.0).__gt__, zs))))
+		fx = list(map(mul, map(rests.__getitem__, vs), map(signs.__getitem__, us)))
+		fy = list(map(mul, map(rests.__getitem__, us), map(signs.__getitem__, vs)))
+		xs, ys = list(map((xs + fx).__getitem__, pick)), list(map((ys + fy).__getitem__, pick))
+	lengths = list(map(math.sqrt, map(add, map(add, map(mul, xs, xs), map(mul, ys, ys)), map(mul, zs, zs))))
+	normals = array.array("f", bytes(len(xs) * 12))
+	for axis, values in enumerate((xs, ys, zs)):
+		normals[axis::3] = array.array("f", map(truediv, values, lengths))
+	return normals
+
+class G3DMeshIndex:								 #Offset table entry of one Mesh, filled without touching its data
+	def __init__(self, fileID, header, isv4):
+		self.header = header
+		self.offset = fileID.tell()			#Start of the Mesh Datapack
+		vertexsize = header.framecount * header.vertexcount * 12
+		if isv4 and header.encoding:		#V5 compressed, the stream sizes are stored in front of the streams
+			vertexsize = 24 + header.vertexcount * 12
+			fileID.seek(self.offset + vertexsize)
+			deltasize = struct.unpack("<I", fileID.read(4))[0]
+			vertexsize += 4 + deltasize
+			fileID.seek(self.offset + vertexsize)
+			normalsize = 4 + struct.unpack("<I", fileID.read(4))[0]
+			texcoordsize = header.vertexcount * 8 if header.hastexture else 0
+			colorsize = 0
+		elif isv4:
+			normalsize = vertexsize
+			texcoordsize = header.vertexcount * 8 if header.hastexture else 0
+			colorsize = 0
+		else:
+			normalsize = header.normalframecount * header.vertexcount * 12
+			texcoordsize = header.texturecoordframecount * header.vertexcount * 8
+			colorsize = header.colorframecount * 16
+		self.vertexoffset   = self.offset
+		self.normaloffset   = self.vertexoffset + vertexsize
+		self.texcoordoffset = self.normaloffset + normalsize
+		self.coloroffset    = self.texcoordoffset + texcoordsize
+		self.indexoffset    = self.coloroffset + colorsize
+		self.end            = self.indexoffset + header.indexcount * 4
+
+	@property
+	def meshname(self):
+		return self.header.meshname
+
+	@property
+	def framecount(self):
+		return self.header.framecount
+
+	@property
+	def vertexcount(self):
+		return self.header.vertexcount
+
+	@property
+	def indexcount(self):
+		return self.header.indexcount
+
+class G3DFile:												  #Memory mapped G3D file with a per-Mesh offset table
+	#Only the headers are parsed when opening, the Mesh Datapacks are
+	#materialised from the mapping when meshdata() asks for them.
+	#source is a path or a binary stream such as a zipfile or tarfile member, a stream is read
+	#into memory once and stays open, name is used for it in place of the path
+	def __init__(self, source, name=None):
+		self.meshes = []
+		if isinstance(source, str):
+			self.filepath = source
+			self._file = open(source, "rb")
+			try:
+				self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+			except ValueError:					#Empty files can't be mapped
+				self._file.close()
+				raise EOFError("G3D file is empty")
+		else:
+			self.filepath = name or str(getattr(source, "name", "stream"))
+			self._file = None
+			self._map = G3DBuffer(source.read())
+			if not len(self._map):
+				raise EOFError("G3D file is empty")
+		try:
+			self.header = G3DHeader(self._map)
+			if self.header.id != "G3D" or self.header.version not in SUPPORTED_VERSIONS:
+				return							#Leave the verdict to the caller
+			basename = os.path.basename(self.filepath).split('.')[0]
+			if self.header.version == 3:
+				self.modelheader = G3DModelHeaderv3(self._map)
+			else:
+				self.modelheader = G3DModelHeaderv4(self._map)
+			for x in range(self.modelheader.meshcount):
+				if self.header.version == 3:
+					meshheader = G3DMeshHeaderv3(self._map)
+					meshheader.isv4 = False
+					meshheader.meshname = basename+str(x+1)	 #Generate Meshname because V3 has none
+				else:
+					meshheader = G3DMeshHeaderv5(self._map) if self.header.version == 5 else G3DMeshHeaderv4(self._map)
+					meshheader.isv4 = True			#V5 Meshes have the V4 layout
+					if len(meshheader.meshname.strip("\0")) == 0:	#When no Meshname in File Generate one
+						meshheader.meshname = basename+str(x+1)
+				entry = G3DMeshIndex(self._map, meshheader, meshheader.isv4)
+				if entry.end > len(self._map):
+					raise EOFError("G3D mesh data is truncated")
+				self.meshes.append(entry)
+				self._map.seek(entry.end)
+		except BaseException:				#a truncated or corrupt file mustn't leave the file and mapping open
+			self.close()
+			raise
+
+	def meshdata(self, index):
+		entry = self.meshes[index]
+		self._map.seek(entry.offset)
+		if self.header.version == 5:
+			return G3DMeshdataV5(self._map, entry.header)
+		if entry.header.isv4:
+			return G3DMeshdataV4(self._map, entry.header)
+		return G3DMeshdataV3(self._map, entry.header)
+
+	def close(self):
+		try:
+			self._map.close()
+		except BufferError:
+			pass							#Views are still alive, the mapping goes away with them
+		if self._file:
+			self._file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+class G3DMeshWriter:										 #Collect the frames of one Mesh and write it
+	header_format = "<64s3I8f2I"
+	header_formatv3 = "<7I64s"
+	texname_format = "<64s"
+
+	def __init__(self, meshname, frameCount, vertexCount, indices, newverts, uvlist,
+			diffuseColor, specularColor, specularPower, opacity, properties, textures, texnames):
+		self.meshname = meshname
+		self.frameCount = frameCount
+		self.vertexCount = vertexCount
+		self.indices = indices
+		self.newverts = newverts
+		self.uvlist = uvlist
+		self.diffuseColor = tuple(diffuseColor)
+		self.specularColor = tuple(specularColor)
+		self.specularPower = specularPower
+		self.opacity = opacity
+		self.properties = properties
+		self.textures = textures
+		self.texnames = texnames
+		# the vertices and normals of all frames are spooled until the Datapack is written. Each frame is placed
+		# at its own offset as the exporter's StaticCheck holds back frames matching frame 0 and packs them late
+		self._vertexspool = tempfile.TemporaryFile()
+		self._normalspool = tempfile.TemporaryFile()
+		self.boxmin = None					#bounding box of all frames, V5 quantises against it
+		self.boxmax = None
+		self.extensions = {}				#V5 extension chunks, tag: bytes
+		self.stats = None					#sizes and error of the last V5 write
+		self.order = None					#old index of every vertex when optimize reordered them
+		self._gather = None					#source index of every written vertex, seam duplicates and order applied
+		self.bounds = False					#write the bounds in a BNDS chunk, V5 only
+		self.framebounds = {}				#frame: G3DBounds, filled by addframe when bounds is set
+
+	def addframe(self, frame, vertices, normals):
+		# duplicate vertices and corresponding normals, for every frame, and put them in the optimized order.
+		# Both are one gather whose indices are worked out on the first frame
+		if self._gather is None and (self.newverts or self.order is not None):
+			gather = list(range(self.vertexCount - len(self.newverts))) + list(self.newverts)
+			self._gather = gather if self.order is None else [gather[old] for old in self.order]
+		if self._gather is not None:
+			vertices = permute(vertices, self._gather)
+			normals = permute(normals, self._gather)
+		framesize = self.vertexCount * 12
+		if self.vertexCount:
+			low = [min(vertices[axis::3]) for axis in range(3)]
+			high = [max(vertices[axis::3]) for axis in range(3)]
+		bounds = boundsof(vertices) if self.bounds else None
+		if bounds:
+			self.framebounds[frame] = bounds
+		if self.vertexCount:
+			self.boxmin = low if self.boxmin is None else [min(a, b) for a, b in zip(self.boxmin, low)]
+			self.boxmax = high if self.boxmax is None else [max(a, b) for a, b in zip(self.boxmax, high)]
+		self._vertexspool.seek(frame * framesize)
+		writeblock(self._vertexspool, vertices)
+		self._normalspool.seek(frame * framesize)
+		writeblock(self._normalspool, normals)
+
+	def makestatic(self):
+		# Keep only frame 0, for Meshes which don't move over the animation
+		self.frameCount = 1
+		self.framebounds = dict((frame, bounds) for frame, bounds in self.framebounds.items() if frame == 0)
+		self._vertexspool.truncate(self.vertexCount * 12)
+		self._normalspool.truncate(self.vertexCount * 12)
+
+	def reducekeys(self, tolerance):
+		# Drop the frames which are the linear interpolation of the kept frames around them, to within tolerance
+		# on every vertex coordinate, and record the frame numbers of the kept ones in the FTIM extension.
+		# Call after all frames are added, the normals follow the vertices. Returns the number of frames kept
+		if self.frameCount < 3:
+			return self.frameCount
+		# One pass over the frames, each read once from the spool. For every coordinate the slopes of the lines
+		# through the last kept frame which pass every frame since within tolerance narrow down to [low, high],
+		# a frame ends the segment as long as its own slope is inside, otherwise the frame before it is kept
+		kept = [0]
+		key = previous = self._readframe(self._vertexspool, 0).tolist()
+		low = [-math.inf] * len(key)
+		high = [math.inf] * len(key)
+		for frame in range(1, self.frameCount):
+			values = self._readframe(self._vertexspool, frame).tolist()
+			d = frame - kept[-1]
+			if d > 1 and not all(lo <= (v - a) / d <= hi for v, a, lo, hi in zip(values, key, low, high)):
+				kept.append(frame - 1)
+				key = previous
+				low = [-math.inf] * len(key)
+				high = [math.inf] * len(key)
+				d = 1
+			low = [max(lo, (v - a - tolerance) / d) for v, a, lo in zip(values, key, low)]
+			high = [min(hi, (v - a + tolerance) / d) for v, a, hi in zip(values, key, high)]
+			previous = values
+		kept.append(self.frameCount - 1)
+		key = previous = low = high = None
+		if len(kept) < self.frameCount:
+			vertexspool, normalspool = tempfile.TemporaryFile(), tempfile.TemporaryFile()
+			for frame in kept:
+				writeblock(vertexspool, self._readframe(self._vertexspool, frame))
+				writeblock(normalspool, self._readframe(self._normalspool, frame))
+			self._vertexspool.close()
+			self._normalspool.close()
+			self._vertexspool, self._normalspool = vertexspool, normalspool
+			self.frameCount = len(kept)
+			self.framebounds = dict((new, self.framebounds[old]) for new, old in enumerate(kept) if old in self.framebounds)
+			times = array.array("I", kept)
+			if sys.byteorder != "little":
+				times.byteswap()
+			self.extensions["FTIM"] = times.tobytes()
+		return len(kept)
+
+	def optimize(self, cachesize=32):
+		# Reorder the triangles for the post transform vertex cache and the vertices into first use order,
+		# the frames added afterwards are remapped the same way. Returns ACMR and ATVR before and after
+		before = cachestats(self.indices, self.vertexCount, cachesize)
+		indices = tipsify(self.indices, self.vertexCount, cachesize)
+		order = firstuse(indices, self.vertexCount)
+		remap = array.array("I", bytes(len(order) * 4))
+		for new, old in enumerate(order):
+			remap[old] = new
+		self.indices = array.array("I", [remap[i] for i in indices])
+		if self.uvlist:
+			self.uvlist = [self.uvlist[old] for old in order]
+		self.order = order
+		self._gather = None
+		return before + cachestats(self.indices, self.vertexCount, cachesize)
+
+	def simplified(self, ratio, samples=8):
+		# A new writer with about ratio of the triangles, made by quadric edge collapses which are
+		# measured on up to samples frames of the animation and applied alike to all of them.
+		# Call after all frames are added, the error is stored in lod of the new writer
+		framesize = self.vertexCount * 3
+		count = min(samples, self.frameCount)
+		frames = sorted(set(i * (self.frameCount - 1) // max(count - 1, 1) for i in range(count)))
+		positions = [self._readframe(self._vertexspool, frame).tolist() for frame in frames]
+		target = int(len(self.indices) // 3 * ratio)
+		indices, error = simplify(self.indices, positions, self.vertexCount, target)
+		positions = None
+		order = firstuse(indices, self.vertexCount)[:len(set(indices))]
+		remap = array.array("I", bytes(framesize // 3 * 4))
+		for new, old in enumerate(order):
+			remap[old] = new
+		writer = G3DMeshWriter(self.meshname, self.frameCount, len(order), array.array("I", [remap[i] for i in indices]), [],
+			[self.uvlist[old] for old in order] if self.uvlist else [],
+			self.diffuseColor, self.specularColor, self.specularPower, self.opacity, self.properties, self.textures, self.texnames)
+		writer.extensions = dict(self.extensions)
+		writer.bounds = self.bounds
+		for frame in range(self.frameCount):
+			writer.addframe(frame, permute(self._readframe(self._vertexspool, frame), order),
+				permute(self._readframe(self._normalspool, frame), order))
+		writer.lod = {"ratio": ratio, "triangles": len(indices) // 3, "error": error}
+		return writer
+
+	def _readframe(self, spool, frame):
+		spool.seek(frame * self.vertexCount * 12)
+		return readblock(spool, "f", self.vertexCount * 3)
+
+	def allbounds(self):
+		# G3DBounds of the whole animation and of every frame, None unless bounds was set before adding the frames
+		if not self.bounds or len(self.framebounds) != self.frameCount:
+			return None, []
+		framebounds = [self.framebounds[frame] for frame in range(self.frameCount)]
+		return enclose(framebounds), framebounds
+
+	def write(self, fileID, version=4):
+		if version == 3:
+			self._writeheaderv3(fileID)
+		else:
+			self._writeheaderv4(fileID)
+		if version == 5:
+			self._writeextensions(fileID)
+			fileID.write(struct.pack("<I", 1))
+			self._writecompressed(fileID)
+		else:
+			#MeshData, see G3DMeshdataV4 and G3DMeshdataV3
+			self._vertexspool.seek(0)
+			shutil.copyfileobj(self._vertexspool, fileID)
+			self._normalspool.seek(0)
+			shutil.copyfileobj(self._normalspool, fileID)
+		# texcoords
+		if self.textures: # only when we have textures
+			writeblock(fileID, array.array("f", chain.from_iterable(self.uvlist)))
+		if version == 3: # one RGBA color frame
+			writeblock(fileID, array.array("f", self.diffuseColor + (self.opacity,)))
+		writeblock(fileID, self.indices)
+
+	def _writeheaderv4(self, fileID):
+		# MeshHeader
+		fileID.write(struct.pack(self.header_format,
+			bytes(self.meshname, "ascii"),
+			self.frameCount, self.vertexCount, len(self.indices),
+			self.diffuseColor[0], self.diffuseColor[1], self.diffuseColor[2],
+			self.specularColor[0], self.specularColor[1], self.specularColor[2],
+			self.specularPower, self.opacity,
+			self.properties, self.textures
+		))
+		#Texture names
+		if self.textures: # only when we have textures
+			for texname in self.texnames:
+				fileID.write(struct.pack(self.texname_format, bytes(texname, "ascii")))
+
+	def _writeextensions(self, fileID):
+		extensions = dict(self.extensions)
+		bounds, framebounds = self.allbounds()
+		if bounds:
+			extensions["BNDS"] = b"".join(b.pack() for b in [bounds] + framebounds)
+		chunks = b"".join(struct.pack("<4sI", bytes(tag, "ascii"), len(data)) + data for tag, data in sorted(extensions.items()))
+		fileID.write(struct.pack("<I", len(chunks)))
+		fileID.write(chunks)
+
+	def _writecompressed(self, fileID):
+		# V5 MeshData, frame 0 as it is, then the quantised deltas of the other frames and the octahedral normals
+		framesize = self.vertexCount * 3
+		boxmin = self.boxmin or [0.0, 0.0, 0.0]
+		boxmax = self.boxmax or [0.0, 0.0, 0.0]
+		# quantise against the box as the reader sees it, in float32
+		box = struct.unpack("<6f", struct.pack("<6f", *(boxmin + [b - a for a, b in zip(boxmin, boxmax)])))
+		boxmin, boxsize = list(box[0:3]), box[3:6]
+		scales = [65535 / size if size > 0.0 else 0.0 for size in boxsize]
+		steps = [size / 65535 for size in boxsize]
+		fileID.write(struct.pack("<6f", *box))
+		self._vertexspool.seek(0)
+		writeblock(fileID, readblock(self._vertexspool, "f", framesize))
+
+		maxerror = 0.0
+		compressor = zlib.compressobj(6)
+		deltas = []
+		previous = 0
+		for frame in range(1, self.frameCount):
+			vertices = readblock(self._vertexspool, "f", framesize)
+			q = array.array("H", bytes(framesize * 2))
+			for axis in range(3):
+				offsets = list(map(sub, vertices[axis::3], repeat(boxmin[axis])))
+				values = list(map(int, map((0.5).__add__, map(scales[axis].__mul__, offsets))))
+				if values and max(values) > 65535:
+					values = list(map(min, values, repeat(65535)))
+				q[axis::3] = array.array("H", values)
+				if values:
+					maxerror = max(maxerror, max(map(abs, map(sub, offsets, map(steps[axis].__mul__, values)))))
+			lanes = _lanes(_splitplanes(q), 0, framesize)
+			deltas.append(compressor.compress(_unlanes(_delta(lanes, previous, framesize), framesize)))
+			previous = lanes
+		deltas.append(compressor.flush())
+		deltas = b"".join(deltas)
+		fileID.write(struct.pack("<I", len(deltas)))
+		fileID.write(deltas)
+
+		compressor = zlib.compressobj(6)
+		normals = []
+		previous = 0
+		self._normalspool.seek(0)
+		for frame in range(self.frameCount):
+			lanes = _lanes(_splitplanes(_octencode(readblock(self._normalspool, "f", framesize))), 0, self.vertexCount * 2)
+			normals.append(compressor.compress(_unlanes(_delta(lanes, previous, self.vertexCount * 2), self.vertexCount * 2)))
+			previous = lanes
+		normals.append(compressor.flush())
+		normals = b"".join(normals)
+		fileID.write(struct.pack("<I", len(normals)))
+		fileID.write(normals)
+
+		rawsize = self.frameCount * framesize * 8
+		size = 24 + framesize * 4 + 8 + len(deltas) + len(normals)
+		self.stats = {"rawsize": rawsize, "size": size, "ratio": rawsize / size, "maxerror": maxerror}
+
+	def _writeheaderv3(self, fileID):
+		# MeshHeader, V3 has no name, colors or specular and normal textures and its property bits differ
+		properties = 0
+		if not self.textures:
+			properties |= 1
+		if self.properties & 2: # two sided
+			properties |= 2
+		if self.properties & 1: # custom color
+			properties |= 4
+		fileID.write(struct.pack(self.header_formatv3,
+			self.frameCount, self.frameCount, 1 if self.textures else 0, 1,
+			self.vertexCount, len(self.indices), properties,
+			bytes(self.texnames[0] if self.textures else "", "ascii")
+		))
+
+	def close(self):
+		self._vertexspool.close()
+		self._normalspool.close()
+
+class G3DMeshBlock:										 #A Mesh as it was encoded before, written back unchanged
+	def __init__(self, meshname, block):
+		self.meshname = meshname
+		self.block = block
+		self.stats = None
+
+	def write(self, fileID, version=4):
+		fileID.write(self.block)
+
+	def close(self):
+		pass
+
+def writemodel(fileID, writers, version=4, cancelled=None):
+	#Write the File Header, the Model Header and then every Mesh,
+	#returns the (start, end) file offsets of every Mesh. cancelled is a threading.Event
+	#checked before every Mesh, the write stops and returns None once it's set
+	fileID.write(struct.pack("<3cB", b'G', b'3', b'D', version))
+	if version == 3:
+		fileID.write(struct.pack("<I", len(writers)))
+	else:
+		fileID.write(struct.pack("<HB", len(writers), 0))
+	ranges = []
+	for writer in writers:
+		if cancelled is not None and cancelled.is_set():
+			return None
+		start = fileID.tell()
+		writer.write(fileID, version)
+		ranges.append((start, fileID.tell()))
+	return ranges
+
+###########################################################################
+# Merging
+###########################################################################
+def mergekey(writer):
+	#Writers with the same key can be drawn as one Mesh: same flags, material, textures and frames
+	return (writer.properties, writer.textures, tuple(writer.texnames), writer.diffuseColor, writer.specularColor,
+		writer.specularPower, writer.opacity, writer.frameCount)
+
+def mergewriters(writers, meshname=None):
+	#One writer holding the vertices and triangles of all writers, which must have the same mergekey.
+	#The vertices are appended in order and the indices rebased. Call after all frames are added
+	first = writers[0]
+	indices = array.array("I")
+	uvlist = []
+	vertexcount = 0
+	for writer in writers:
+		indices.extend(array.array("I", map(vertexcount.__add__, writer.indices)))
+		if first.textures:
+			uvlist.extend(writer.uvlist)
+		vertexcount += writer.vertexCount
+	merged = G3DMeshWriter(meshname or first.meshname, first.frameCount, vertexcount, indices, [], uvlist,
+		first.diffuseColor, first.specularColor, first.specularPower, first.opacity, first.properties, first.textures, list(first.texnames))
+	merged.bounds = any(writer.bounds for writer in writers)
+	for frame in range(first.frameCount):
+		vertices, normals = array.array("f"), array.array("f")
+		for writer in writers:
+			vertices.frombytes(writer._readframe(writer._vertexspool, frame).cast("B"))
+			normals.frombytes(writer._readframe(writer._normalspool, frame).cast("B"))
+		merged.addframe(frame, vertices, normals)
+	return merged
+
+###########################################################################
+# Vertex cache optimisation
+###########################################################################
+def cachestats(indices, vertexcount, cachesize=32):
+	#ACMR (cache misses per triangle) and ATVR (misses per referenced vertex) of a FIFO post transform cache
+	stamp = [-cachesize - 1] * vertexcount		#miss count when the vertex entered the cache
+	misses = 0
+	for v in indices:
+		if misses - stamp[v] > cachesize:
+			stamp[v] = misses
+			misses += 1
+	referenced = vertexcount - stamp.count(-cachesize - 1)
+	triangles = len(indices) // 3
+	return (misses / triangles if triangles else 0.0, misses / referenced if referenced else 0.0)
+
+def tipsify(indices, vertexcount, cachesize=32):
+	#Triangle order of Sander, Nehab and Barczak, "Fast Triangle Reordering for Vertex Locality and Reduced Overdraw".
+	#Fans around a vertex, then continues with the neighbour which will still be in the cache, linear in the triangle count
+	tricount = len(indices) // 3
+	live = [0] * vertexcount					#triangles of each vertex not emitted yet
+	for v in indices:
+		live[v] += 1
+	offsets = [0] * (vertexcount + 1)
+	for v in range(vertexcount):
+		offsets[v + 1] = offsets[v] + live[v]
+	adjacency = array.array("I", bytes(len(indices) * 4))
+	fill = offsets[:-1]
+	for i, v in enumerate(indices):
+		adjacency[fill[v]] = i // 3
+		fill[v] += 1
+	cachetime = [0] * vertexcount
+	emitted = bytearray(tricount)
+	deadend = []
+	output = array.array("I")
+	time = cachesize + 1
+	cursor = 0
+	fan = next((v for v in range(vertexcount) if live[v]), -1)
+	while fan >= 0:
+		candidates = []
+		for t in adjacency[offsets[fan]:offsets[fan + 1]]:
+			if emitted[t]:
+				continue
+			emitted[t] = 1
+			for v in indices[t * 3:t * 3 + 3]:
+				output.append(v)
+				deadend.append(v)
+				candidates.append(v)
+				live[v] -= 1
+				if time - cachetime[v] > cachesize:
+					cachetime[v] = time
+					time += 1
+		#Next fanning vertex: a candidate whose triangles fit in the cache while it's still there, the oldest one first
+		fan = -1
+		best = -1
+		for v in candidates:
+			if live[v]:
+				priority = time - cachetime[v] if time - cachetime[v] + 2 * live[v] <= cachesize else 0
+				if priority > best:
+					fan, best = v, priority
+		while fan < 0 and deadend:
+			v = deadend.pop()
+			if live[v]:
+				fan = v
+		while fan < 0 and cursor < vertexcount:
+			if live[cursor]:
+				fan = cursor
+			cursor += 1
+	return output
+
+def firstuse(indices, vertexcount):
+	#Old vertex index for every new position, vertices in the order the indices reference them, unreferenced ones last
+	seen = bytearray(vertexcount)
+	order = array.array("I")
+	for v in indices:
+		if not seen[v]:
+			seen[v] = 1
+			order.append(v)
+	order.extend(v for v in range(vertexcount) if not seen[v])
+	return order
+
+def permute(block, order):
+	#Gather the x, y, z triples of a flat float block in the given order, a column at a time through itemgetter
+	result = array.array("f", bytes(len(order) * 12))
+	if len(order) < 2:		#itemgetter of one index returns the item instead of a tuple
+		for axis in range(3):
+			result[axis::3] = array.array("f", [block[old * 3 + axis] for old in order])
+		return result
+	gather = itemgetter(*order)
+	for axis in range(3):
+		result[axis::3] = array.array("f", gather(block[axis::3]))
+	return result
+
+###########################################################################
+# Level of detail
+###########################################################################
+def _planequadric(positions, a, b, c):
+	#Quadric of the plane of triangle a, b, c as its 10 upper triangle coefficients, None when degenerate
+	ax, ay, az = positions[a * 3:a * 3 + 3]
+	ux, uy, uz = positions[b * 3] - ax, positions[b * 3 + 1] - ay, positions[b * 3 + 2] - az
+	vx, vy, vz = positions[c * 3] - ax, positions[c * 3 + 1] - ay, positions[c * 3 + 2] - az
+	nx, ny, nz = uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+	length = math.sqrt(nx * nx + ny * ny + nz * nz)
+	if length == 0.0:
+		return None
+	nx, ny, nz = nx / length, ny / length, nz / length
+	d = -(nx * ax + ny * ay + nz * az)
+	return (nx * nx, nx * ny, nx * nz, nx * d, ny * ny, ny * nz, ny * d, nz * nz, nz * d, d * d)
+
+def _quadricerror(q, x, y, z):
+	return (q[0] * x * x + 2 * q[1] * x * y + 2 * q[2] * x * z + 2 * q[3] * x + q[4] * y * y
+		+ 2 * q[5] * y * z + 2 * q[6] * y + q[7] * z * z + 2 * q[8] * z + q[9])
+
+def _normal(positions, a, b, c):
+	ax, ay, az = positions[a * 3:a * 3 + 3]
+	ux, uy, uz = positions[b * 3] - ax, positions[b * 3 + 1] - ay, positions[b * 3 + 2] - az
+	vx, vy, vz = positions[c * 3] - ax, positions[c * 3 + 1] - ay, positions[c * 3 + 2] - az
+	return uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+
+def simplify(indices, frames, vertexcount, target):
+	#Half edge collapses in the order of least quadric error (Garland and Heckbert) until at most target
+	#triangles are left. frames holds the flat x, y, z positions of the sampled frames, a collapse is
+	#rated on all of them and only moves a vertex onto a neighbour, so it applies to every frame alike.
+	#Vertices on a border or on a UV seam (duplicates at the same position) never move.
+	#Returns the indices of the kept triangles and the largest error, as a distance averaged over the frames
+	tris = [list(indices[i:i + 3]) for i in range(0, len(indices) - 2, 3)]
+	alive = bytearray(b"\1") * len(tris)
+	vtris = [set() for v in range(vertexcount)]
+	edges = {}
+	for t, tri in enumerate(tris):
+		for v in tri:
+			vtris[v].add(t)
+		for a, b in ((tri[0], tri[1]), (tri[1], tri[2]), (tri[2], tri[0])):
+			key = (a, b) if a < b else (b, a)
+			edges[key] = edges.get(key, 0) + 1
+	locked = bytearray(vertexcount)
+	for (a, b), count in edges.items():
+		if count != 2:
+			locked[a] = locked[b] = 1
+	first = frames[0]
+	seen = {}
+	for v in range(vertexcount):
+		key = tuple(first[v * 3:v * 3 + 3])
+		if key in seen:
+			locked[v] = locked[seen[key]] = 1
+		else:
+			seen[key] = v
+	seen = None
+
+	quadrics = []
+	for positions in frames:
+		q = [[0.0] * 10 for v in range(vertexcount)]
+		for tri in tris:
+			plane = _planequadric(positions, *tri)
+			if plane:
+				for v in tri:
+					q[v] = [x + y for x, y in zip(q[v], plane)]
+		quadrics.append(q)
+
+	version = [0] * vertexcount
+	def collapses(a, b):
+		#Heap entries of the allowed collapses of the edge a, b
+		entries = []
+		for u, v in ((a, b), (b, a)):
+			if not locked[u]:
+				cost = 0.0
+				for q, positions in zip(quadrics, frames):
+					quadric = [x + y for x, y in zip(q[u], q[v])]
+					cost += _quadricerror(quadric, *positions[v * 3:v * 3 + 3])
+				entries.append((max(cost, 0.0), u, v, version[u], version[v]))
+		return entries
+	heap = []
+	for a, b in edges:
+		heap.extend(collapses(a, b))
+	edges = None
+	heapq.heapify(heap)
+
+	count = len(tris)
+	maxerror = 0.0
+	while count > target and heap:
+		cost, u, v, versionu, versionv = heapq.heappop(heap)
+		if version[u] != versionu or version[v] != versionv or not vtris[u] or not vtris[v]:
+			continue
+		shared = vtris[u] & vtris[v]
+		if not shared:
+			continue
+		#Link condition, the collapse mustn't join two sheets of the surface
+		neighboursu = set(w for t in vtris[u] for w in tris[t])
+		neighboursv = set(w for t in vtris[v] for w in tris[t])
+		if len(neighboursu & neighboursv) - 2 > len(shared):
+			continue
+		#The triangles which stay must not flip in any of the frames
+		flipped = False
+		for t in vtris[u] - shared:
+			tri = tris[t]
+			moved = [v if w == u else w for w in tri]
+			for positions in frames:
+				n0 = _normal(positions, *tri)
+				n1 = _normal(positions, *moved)
+				if n0[0] * n1[0] + n0[1] * n1[1] + n0[2] * n1[2] <= 0.0:
+					flipped = True
+					break
+			if flipped:
+				break
+		if flipped:
+			continue
+
+		for t in shared:
+			alive[t] = 0
+			count -= 1
+			for w in tris[t]:
+				vtris[w].discard(t)
+		for t in vtris[u]:
+			tri = tris[t]
+			tri[tri.index(u)] = v
+			vtris[v].add(t)
+		vtris[u] = set()
+		for q in quadrics:
+			q[v] = [x + y for x, y in zip(q[u], q[v])]
+		maxerror = max(maxerror, cost)
+		version[u] += 1
+		version[v] += 1
+		for w in set(w for t in vtris[v] for w in tris[t]):
+			if w != v:
+				for entry in collapses(w, v):
+					heapq.heappush(heap, entry)
+
+	result = array.array("I")
+	for t, tri in enumerate(tris):
+		if alive[t]:
+			result.extend(tri)
+	return result, math.sqrt(maxerror / len(frames))
+
+###########################################################################
+# Welding
+###########################################################################
+def weld(meshdata, distance=0.0001, normaltolerance=0.001):
+	#Merge the vertices which are closer than distance in every frame and whose frame 0 normals agree,
+	#so split normals stay split. Candidates are found in a hashed grid of frame 0 with cells of twice
+	#the distance, where only the cell and its neighbours on the near side of every axis can hold a match.
+	#Returns remap, the welded index of every vertex, and keep, the vertex kept for every welded index
+	vertexcount = meshdata.vertexcount
+	stride = vertexcount * 3
+	vertexdata = meshdata.vertexdata
+	framecount = len(vertexdata) // stride if stride else 0
+	first = meshdata.vertexframe(0).tolist()
+	normals = meshdata.normalframe(0).tolist()
+	limit = distance * distance
+	scale = 0.5 / distance
+	grid = {}
+	remap = array.array("I", bytes(vertexcount * 4))
+	keep = array.array("I")
+	for v in range(vertexcount):
+		x, y, z = first[v * 3:v * 3 + 3]
+		fx, fy, fz = x * scale, y * scale, z * scale
+		cx, cy, cz = math.floor(fx), math.floor(fy), math.floor(fz)
+		nx = cx - 1 if fx - cx < 0.5 else cx + 1
+		ny = cy - 1 if fy - cy < 0.5 else cy + 1
+		nz = cz - 1 if fz - cz < 0.5 else cz + 1
+		match = -1
+		for cell in ((cx, cy, cz), (nx, cy, cz), (cx, ny, cz), (nx, ny, cz), (cx, cy, nz), (nx, cy, nz), (cx, ny, nz), (nx, ny, nz)):
+			for w in grid.get(cell, ()):
+				if _weldable(vertexdata, normals, keep[w], v, stride, framecount, limit, normaltolerance):
+					match = w
+					break
+			if match >= 0:
+				break
+		if match < 0:
+			match = len(keep)
+			keep.append(v)
+			grid.setdefault((cx, cy, cz), []).append(match)
+		remap[v] = match
+	return remap, keep
+
+def _weldable(vertexdata, normals, a, b, stride, framecount, limit, normaltolerance):
+	if (normals[a * 3] * normals[b * 3] + normals[a * 3 + 1] * normals[b * 3 + 1]
+			+ normals[a * 3 + 2] * normals[b * 3 + 2]) < 1.0 - normaltolerance:
+		return False
+	for offset in range(0, framecount * stride, stride):
+		i, j = offset + a * 3, offset + b * 3
+		dx = vertexdata[i] - vertexdata[j]
+		dy = vertexdata[i + 1] - vertexdata[j + 1]
+		dz = vertexdata[i + 2] - vertexdata[j + 2]
+		if dx * dx + dy * dy + dz * dz > limit:
+			return False
+	return True
+
+def weldindices(indices, remap):
+	#Remap the indices, dropping the triangles which collapsed. Returns the welded indices
+	#and the original indices of the kept triangles, which still address the texcoords
+	welded = array.array("i", map(remap.__getitem__, indices))
+	kept = array.array("i")
+	result = array.array("i")
+	for i in range(0, len(welded) - 2, 3):
+		a, b, c = welded[i:i + 3]
+		if a != b and b != c and a != c:
+			result.extend((a, b, c))
+			kept.extend((indices[i], indices[i + 1], indices[i + 2]))
+	return result, kept
+
+###########################################################################
+# Texture atlas
+###########################################################################
+def _pow2(n):
+	return 1 << max(0, int(n) - 1).bit_length()
+
+def packatlas(sizes, padding=4, maxsize=8192):
+	#Place (width, height) images on shelves, tallest first, with padding pixels around each one.
+	#Returns the power of two atlas width and height and the (x, y) of every image, or None when they don't fit in maxsize
+	if not sizes:
+		return None
+	order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+	area = sum((w + 2 * padding) * (h + 2 * padding) for w, h in sizes)
+	width = _pow2(max(math.sqrt(area), max(w + 2 * padding for w, h in sizes)))
+	while width <= maxsize:
+		positions = [None] * len(sizes)
+		x = y = shelf = 0
+		for i in order:
+			w, h = sizes[i][0] + 2 * padding, sizes[i][1] + 2 * padding
+			if x + w > width:				#next shelf
+				x, y, shelf = 0, y + shelf, 0
+			positions[i] = (x + padding, y + padding)
+			x += w
+			shelf = max(shelf, h)
+		height = _pow2(y + shelf)
+		if height <= width or height <= maxsize and width * 2 > maxsize:
+			return width, height, positions
+		width *= 2							#too tall, try a wider atlas
+	return None
+
+def atlasuv(uvlist, rect, size):
+	#Move (s, t) texcoords of a whole image into its rect (x, y, width, height) of an atlas of size (width, height)
+	x, y, w, h = rect
+	scale = (w / size[0], h / size[1])
+	offset = (x / size[0], y / size[1])
+	return [(offset[0] + s * scale[0], offset[1] + t * scale[1]) for s, t in uvlist]
+
+def blit(atlas, atlaswidth, pixels, width, height, x, y, padding=0, channels=4):
+	#Copy the rows of an image into the flat atlas array at x, y, the edge pixels are repeated
+	#into the padding so filtering and mipmaps don't bleed the neighbouring images in
+	rowsize = width * channels
+	for row in range(-padding, height + padding):
+		start = min(max(row, 0), height - 1) * rowsize
+		line = pixels[start:start + rowsize]
+		line = line[:channels] * padding + line + line[-channels:] * padding
+		start = ((y + row) * atlaswidth + x - padding) * channels
+		atlas[start:start + len(line)] = line
+
+###########################################################################
+# Decoding in worker processes
+###########################################################################
+try:
+	from multiprocessing import shared_memory
+except ImportError:						#Python < 3.8, buffers are returned through the pipe instead
+	shared_memory = None
+
+def blockcounts(header):
+	#Number of items of the blocks of a Mesh Datapack: vertices, normals, texcoords, colors (floats) and indices
+	if header.isv4:
+		return (header.framecount * header.vertexcount * 3, header.framecount * header.vertexcount * 3,
+			header.vertexcount * 2 if header.hastexture else 0, 0, header.indexcount)
+	return (header.framecount * header.vertexcount * 3, header.normalframecount * header.vertexcount * 3,
+		header.texturecoordframecount * header.vertexcount * 2, header.colorframecount * 4, header.indexcount)
+
+def decodedsize(header):
+	return sum(blockcounts(header)) * 4
+
+class G3DMeshdataBuffer(G3DMeshdata):								#Mesh Datapack over decoded blocks in native byte order
+	def __init__(self, header, buffer, offset=0, owner=None):
+		self.vertexcount = header.vertexcount
+		views = []
+		for count, typecode in zip(blockcounts(header), "ffffI"):
+			views.append(memoryview(buffer)[offset:offset + count * 4].cast(typecode))
+			offset += count * 4
+		self.vertexdata, self.normaldata, self.texcoorddata, self.colordata, self.indexdata = views
+		self.owner = owner					#keeps a shared memory block mapped as long as this Mesh uses it, set last so it's released last
+
+def decodefile(filepath, sharedname=None):
+	#Worker side: decode all Meshes of a file back to back into the shared memory block
+	#sharedname, which the caller sized with decodedsize, or into a returned bytes object
+	with G3DFile(filepath) as g3dfile:
+		headers = [entry.header for entry in g3dfile.meshes]
+		if sharedname:
+			shm = shared_memory.SharedMemory(name=sharedname)
+			target = shm.buf
+		else:
+			target = bytearray(sum(decodedsize(header) for header in headers))
+		offset = 0
+		for x, header in enumerate(headers):
+			data = g3dfile.meshdata(x)
+			for view in (data.vertexdata, data.normaldata, getattr(data, "texcoorddata", None),
+					getattr(data, "colordata", None), data.indexdata):
+				if view is not None:
+					target[offset:offset + view.nbytes] = view.cast("B")
+					offset += view.nbytes
+			data = None
+	if sharedname:
+		target = None
+		shm.close()
+		return headers, None
+	return headers, bytes(target)
+
+def decodefiles(filepaths, workers=None):
+	#Decode many files in a process pool, yields (filepath, header, meshes, error) in the given order,
+	#meshes is a list of (meshheader, G3DMeshdataBuffer). The headers are scanned here to size a shared
+	#memory block per file, so the decoded data never goes through the pipe when shared memory is available.
+	#At most two files per worker are in flight and the block of a file is unlinked once the next one is asked
+	#for, so the shared memory holds about 2 * workers files rather than all of them
+	from concurrent.futures import ProcessPoolExecutor
+	from concurrent.futures.process import BrokenProcessPool
+	try:
+		pool = ProcessPoolExecutor(max_workers=workers)
+	except (OSError, NotImplementedError):	#no process support, decode right here
+		pool = None
+	inflight = 2 * (workers or os.cpu_count() or 1)
+	files = iter(filepaths)
+	pending = deque()						#[filepath, header, shared memory, error, future]
+	try:
+		while True:
+			for filepath in files:
+				pending.append(_startdecode(pool, filepath))
+				if len(pending) >= inflight:
+					break
+			if not pending:
+				break
+			job = pending[0]
+			filepath, header, shm, error, future = job
+			if header is None or header.id != "G3D" or header.version not in SUPPORTED_VERSIONS:
+				yield filepath, header, None, error
+				pending.popleft()
+				continue
+			try:
+				try:
+					headers, payload = future.result() if future else decodefile(filepath, shm.name if shm else None)
+				except BrokenProcessPool:
+					headers, payload = decodefile(filepath, shm.name if shm else None)
+			except Exception as e:
+				yield filepath, header, None, e
+			else:
+				buffer = shm.buf if shm else payload
+				meshes = []
+				offset = 0
+				for meshheader in headers:
+					meshes.append((meshheader, G3DMeshdataBuffer(meshheader, buffer, offset, shm)))
+					offset += decodedsize(meshheader)
+				buffer = None
+				yield filepath, header, meshes, None
+				meshes = None
+			_releaseshared(pending.popleft())
+	finally:
+		if pool:
+			pool.shutdown()
+		for job in pending:
+			_releaseshared(job)
+
+def _startdecode(pool, filepath):
+	#Scan the headers of a file, size its shared memory block and submit its decoding to pool
+	try:
+		with G3DFile(filepath) as g3dfile:
+			header = g3dfile.header
+			size = sum(decodedsize(entry.header) for entry in g3dfile.meshes)
+	except (EOFError, IOError, struct.error) as e:
+		return [filepath, None, None, e, None]
+	if header.id != "G3D" or header.version not in SUPPORTED_VERSIONS:
+		return [filepath, header, None, None, None]
+	shm = shared_memory.SharedMemory(create=True, size=max(size, 1)) if shared_memory else None
+	future = pool.submit(decodefile, filepath, shm.name if shm else None) if pool else None
+	return [filepath, header, shm, None, future]
+
+def _releaseshared(job):
+	shm = job[2]
+	if shm:
+		job[2] = None
+		shm.unlink()
+		try:
+			shm.close()
+		except BufferError:
+			pass							#the caller still holds the Meshes, they close it when they go
+
+###########################################################################
+# Profiling
+###########################################################################
+class Profiler:												 #Named timing spans and leveled console output of one import or export
+	#verbosity 0 prints errors and warnings only, 1 adds progress and results, 2 adds the details of every Mesh
+	def __init__(self, verbosity=1):
+		self.verbosity = verbosity
+		self.spans = []						#(name, start, duration, thread, args), in seconds since the profiler was made
+		self.origin = time.perf_counter()
+		self._lock = threading.Lock()
+
+	@contextlib.contextmanager
+	def span(self, name, **args):
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			end = time.perf_counter()
+			with self._lock:
+				self.spans.append((name, start - self.origin, end - start, threading.get_ident(), args))
+
+	def log(self, level, message):
+		if level <= self.verbosity:
+			print(message)
+
+	def totals(self):
+		#name: (count, seconds)
+		totals = {}
+		for name, start, duration, thread, args in self.spans:
+			count, seconds = totals.get(name, (0, 0.0))
+			totals[name] = (count + 1, seconds + duration)
+		return totals
+
+	def report(self):
+		for name, (count, seconds) in sorted(self.totals().items(), key=lambda item: -item[1][1]):
+			self.log(1, "%-18s %6d x %10.3f ms" % (name, count, seconds * 1000))
+
+	def write(self, path, chrome=False):
+		#A Chrome trace (chrome://tracing, Perfetto) or a plain JSON list of the spans with their totals
+		threads = {}
+		for span in self.spans:
+			threads.setdefault(span[3], len(threads))
+		if chrome:
+			data = {"displayTimeUnit": "ms", "traceEvents": [{"name": name, "ph": "X", "ts": start * 1e6, "dur": duration * 1e6,
+				"pid": os.getpid(), "tid": threads[thread], "args": args} for name, start, duration, thread, args in self.spans]}
+		else:
+			data = {"spans": [{"name": name, "start": start, "seconds": duration, "thread": threads[thread], "args": args}
+					for name, start, duration, thread, args in self.spans],
+				"totals": dict((name, {"count": count, "seconds": seconds}) for name, (count, seconds) in self.totals().items())}
+		with open(path, "w") as f:
+			json.dump(data, f, indent=1)
+
+###########################################################################
+# Validation and statistics
+###########################################################################
+FLT_MIN = 1.17549435e-38					#smallest normal float32
+
+def scanfile(filepath):
+	#Validate a file and count what it needs, returns a dict with the statistics and a list of problems
+	result = {"file": filepath, "version": None, "meshes": 0, "vertices": 0, "triangles": 0, "frames": 0,
+		"bytes": 0, "decodedbytes": 0, "problems": []}
+	problems = result["problems"]
+	try:
+		result["bytes"] = os.path.getsize(filepath)
+		with G3DFile(filepath) as g3dfile:
+			header = g3dfile.header
+			result["version"] = header.version
+			if header.id != "G3D":
+				problems.append("not a G3D file")
+				return result
+			if header.version not in SUPPORTED_VERSIONS:
+				problems.append("unsupported version %d" % header.version)
+				return result
+			result["meshes"] = len(g3dfile.meshes)
+			for x, entry in enumerate(g3dfile.meshes):
+				_scanmesh(filepath, entry.header, g3dfile.meshdata(x), result)
+			#the Meshes are indexed by the count in the Model Header, a file with more of them than that
+			#shows as trailing data and one with fewer ends early, which G3DFile raises as EOFError
+			if g3dfile.meshes:
+				end = g3dfile.meshes[-1].end
+			else:
+				end = struct.calcsize(G3DHeader.binary_format) + struct.calcsize(type(g3dfile.modelheader).binary_format)
+			if end != len(g3dfile._map):
+				problems.append("%d bytes of trailing data after %d meshes" % (len(g3dfile._map) - end, len(g3dfile.meshes)))
+	except (EOFError, struct.error, zlib.error) as e:
+		problems.append("truncated or corrupt: %s" % (e or type(e).__name__))
+	except (IOError, OSError) as e:
+		problems.append(str(e))
+	return result
+
+def _scanmesh(filepath, header, data, result):
+	problems = result["problems"]
+	name = header.meshname.split("\0")[0]		#names are NUL padded
+	result["vertices"] += header.vertexcount
+	result["triangles"] += header.indexcount // 3
+	result["frames"] = max(result["frames"], header.framecount)
+	result["decodedbytes"] += decodedsize(header)
+	if header.indexcount % 3:
+		problems.append("%s: index count %d is not a multiple of 3" % (name, header.indexcount))
+	if header.indexcount and max(data.indexdata) >= header.vertexcount:
+		problems.append("%s: index %d out of range, %d vertices" % (name, max(data.indexdata), header.vertexcount))
+	for block, view in (("vertex", data.vertexdata), ("normal", data.normaldata), ("texcoord", getattr(data, "texcoorddata", None))):
+		if view is None:
+			continue
+		#map and filter run in C, the floats are never looked at from Python
+		if not all(map(math.isfinite, view)):
+			problems.append("%s: NaN or infinite %s data" % (name, block))
+		elif min(filter(None, map(abs, view)), default=FLT_MIN) < FLT_MIN:
+			problems.append("%s: denormal %s data" % (name, block))
+	if header.isv4:
+		if header.textures >> 3:
+			problems.append("%s: undefined texture flags 0x%x" % (name, header.textures & ~7))
+		if "BNDS" in header.extensions and header.bounds is None:
+			problems.append("%s: BNDS has %d bytes, expected %d" % (name, len(header.extensions["BNDS"]),
+				(header.framecount + 1) * G3DBounds.size))
+		textures = (header.diffusetexture, header.speculartexture, header.normaltexture)
+	else:
+		textures = (header.diffusetexture,)
+	if "FTIM" in getattr(header, "extensions", {}):
+		times = keyframes(header)
+		if len(header.extensions["FTIM"]) != header.framecount * 4:
+			problems.append("%s: FTIM has %d bytes, expected %d" % (name, len(header.extensions["FTIM"]), header.framecount * 4))
+		elif any(b <= a for a, b in zip(times, times[1:])) or (times and times[0]):
+			problems.append("%s: FTIM frame times don't start at 0 and increase" % name)
+		else:
+			result["frames"] = max(result["frames"], times[-1] + 1 if times else 0)
+	for texture in textures:
+		texture = texture.split("\0")[0] if texture else None
+		if texture and not os.path.isfile(os.path.join(os.path.dirname(os.path.abspath(filepath)), texture)):
+			problems.append("%s: texture %s not found" % (name, texture))
+
+def findfiles(paths):
+	#The .g3d files of paths, directories are walked recursively
+	files = []
+	for path in paths:
+		if os.path.isdir(path):
+			for root, dirs, names in os.walk(path):
+				dirs.sort()
+				files.extend(os.path.join(root, name) for name in sorted(names) if name.lower().endswith(".g3d"))
+		else:
+			files.append(path)
+	return files
+
+def scanfiles(filepaths, workers=None):
+	#scanfile for every file in a process pool, in the given order
+	from concurrent.futures import ProcessPoolExecutor
+	try:
+		pool = ProcessPoolExecutor(max_workers=workers)
+	except (OSError, NotImplementedError):	#no process support, scan right here
+		return [scanfile(filepath) for filepath in filepaths]
+	with pool:
+		return list(pool.map(scanfile, filepaths, chunksize=max(1, len(filepaths) // ((workers or os.cpu_count() or 1) * 8))))
+
+def _scan(args):
+	import csv
+	results = scanfiles(findfiles(args.paths), args.workers)
+	fields = ["file", "version", "meshes", "vertices", "triangles", "frames", "bytes", "decodedbytes", "problems"]
+	if args.csv:
+		with open(args.csv, "w", newline="") as f:
+			writer = csv.writer(f)
+			writer.writerow(fields)
+			for result in results:
+				writer.writerow([result[field] if field != "problems" else "; ".join(result[field]) for field in fields])
+	if args.json:
+		with open(args.json, "w") as f:
+			json.dump(results, f, indent=1)
+	for result in results:
+		for problem in result["problems"]:
+			print("%s: %s" % (result["file"], problem))
+	failed = len([result for result in results if result["problems"]])
+	print("%d files, %d with problems, %d meshes, %d vertices, %d triangles, %.1f MB on disk, %.1f MB decoded" % (
+		len(results), failed, sum(result["meshes"] for result in results), sum(result["vertices"] for result in results),
+		sum(result["triangles"] for result in results), sum(result["bytes"] for result in results) / 1e6,
+		sum(result["decodedbytes"] for result in results) / 1e6))
+	return 1 if failed else 0
+
+###########################################################################
+# Round trip check and benchmark
+###########################################################################
+def syntheticmesh(vertexcount, framecount, textured=True, name="synthetic"):
+	#A mesh of vertexcount/3 separate triangles which moves every frame,
+	#returns the writer and the frames as written so they can be compared
+	indices = array.array("I", range(vertexcount - vertexcount % 3))
+	uvlist = list(zip((i / vertexcount for i in range(vertexcount)), (1.0 - i / vertexcount for i in range(vertexcount)))) if textured else []
+	writer = G3DMeshWriter(name, framecount, vertexcount, indices, [], uvlist,
+		(1.0, 1.0, 1.0), (0.9, 0.9, 0.9), 9.999999, 1.0, 2, 1 if textured else 0, ["synthetic.png"] if textured else [])
+	base = array.array("f", [float(i % 1024) for i in range(vertexcount * 3)])
+	normal = array.array("f", [0.0, 0.0, 1.0]) * vertexcount
+	frames = []
+	for frame in range(framecount):
+		vertices = array.array("f", base)
+		vertices[0] = float(frame)
+		frames.append((vertices, normal))
+	return writer, frames
+
+def roundtrip(vertexcount, framecount=2, textured=True, version=4):
+	#Encode a synthetic model, decode it again and compare, returns the seconds taken by both and the file size
+	writer, frames = syntheticmesh(vertexcount, framecount, textured)
+	fd, path = tempfile.mkstemp(suffix=".g3d")
+	os.close(fd)
+	try:
+		start = time.perf_counter()
+		for frame, (vertices, normals) in enumerate(frames):
+			writer.addframe(frame, vertices, normals)
+		with open(path, "wb") as fileID:
+			writemodel(fileID, [writer], version)
+		encode = time.perf_counter() - start
+		writer.close()
+
+		start = time.perf_counter()
+		with G3DFile(path) as g3dfile:
+			data = g3dfile.meshdata(0)
+			vertexdata = data.vertexdata.tobytes()
+			normaldata = data.normaldata.tobytes()
+			texcoorddata = data.texcoorddata.tobytes() if textured else b""
+			indexdata = data.indexdata.tobytes()
+			data = None
+		decode = time.perf_counter() - start
+
+		if version == 5:
+			#Lossy, allow the quantisation error reported by the writer plus float32 rounding
+			expect = array.array("f", chain.from_iterable(vertices for vertices, normals in frames))
+			if not _isclose(vertexdata, expect, writer.stats["maxerror"] * 1.01 + 1e-4):
+				raise AssertionError("vertices differ after round trip")
+			expect = array.array("f", chain.from_iterable(normals for vertices, normals in frames))
+			if not _isclose(normaldata, expect, 1e-4):
+				raise AssertionError("normals differ after round trip")
+		else:
+			expect = array.array("f", chain.from_iterable(vertices for vertices, normals in frames))
+			if sys.byteorder != "little":
+				expect.byteswap()
+			if vertexdata != expect.tobytes():
+				raise AssertionError("vertices differ after round trip")
+			expect = array.array("f", chain.from_iterable(normals for vertices, normals in frames))
+			if sys.byteorder != "little":
+				expect.byteswap()
+			if normaldata != expect.tobytes():
+				raise AssertionError("normals differ after round trip")
+		if textured and len(texcoorddata) != vertexcount * 8:
+			raise AssertionError("texcoords differ after round trip")
+		if indexdata != writer.indices.tobytes() if sys.byteorder == "little" else len(indexdata) != len(writer.indices) * 4:
+			raise AssertionError("indices differ after round trip")
+		return encode, decode, os.path.getsize(path)
+	finally:
+		os.remove(path)
+
+def _isclose(data, expect, tolerance):
+	got = array.array("f")
+	got.frombytes(data)
+	return len(got) == len(expect) and all(abs(a - b) <= tolerance for a, b in zip(got, expect))
+
+def main(argv):
+	import argparse
+	parser = argparse.ArgumentParser(prog="g3d.py", description="G3D codec tools")
+	commands = parser.add_subparsers(dest="command")
+	bench = commands.add_parser("bench", help="round trip synthetic models and measure encode/decode throughput")
+	bench.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000], help="vertex counts")
+	bench.add_argument("--frames", type=int, default=2)
+	bench.add_argument("--version", type=int, nargs="+", default=[3, 4], choices=SUPPORTED_VERSIONS)
+	bench.add_argument("--repeat", type=int, default=3, help="best of this many runs")
+	bench.add_argument("--json", help="write the results to this file")
+	scan = commands.add_parser("scan", help="validate .g3d files and report their statistics")
+	scan.add_argument("paths", nargs="+", help="files or directories, directories are searched recursively")
+	scan.add_argument("--workers", type=int, help="number of processes, default is one per CPU")
+	scan.add_argument("--csv", help="write one line per file to this file")
+	scan.add_argument("--json", help="write the results to this file")
+	args = parser.parse_args(argv)
+	if args.command == "bench":
+		return _bench(args)
+	if args.command == "scan":
+		return _scan(args)
+	parser.print_help()
+	return 2
+
+def _bench(args):
+	results = []
+	for version in args.version:
+		for size in args.sizes:
+			runs = [roundtrip(size, args.frames, True, version) for i in range(args.repeat)]
+			encode = min(run[0] for run in runs)
+			decode = min(run[1] for run in runs)
+			megabytes = runs[0][2] / 1e6
+			results.append({"version": version, "vertices": size, "frames": args.frames, "bytes": runs[0][2],
+				"encode_mbs": megabytes / encode, "decode_mbs": megabytes / decode})
+			print("v%d %8d vertices %8.2f MB  encode %8.1f MB/s  decode %8.1f MB/s" %
+				(version, size, megabytes, megabytes / encode, megabytes / decode))
+	if args.json:
+		with open(args.json, "w") as f:
+			json.dump(results, f, indent=1)
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,435 @@
+# Tests of the Blender independent part of the add-on, io_g3d/g3d.py
+#   python -m pytest Ablaze.Graphics/tests
+# The benchmarks use pytest-benchmark and are skipped when it isn't installed,
+# with it they can be run alone with --benchmark-only
+###########################################################################
+import sys, os, io, gc, warnings, array, struct, importlib.util
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "io_g3d"))
+import g3d
+
+benchmarked = pytest.mark.skipif(importlib.util.find_spec("pytest_benchmark") is None, reason="needs pytest-benchmark")
+
+###########################################################################
+# Helpers
+###########################################################################
+def grid(n, z=0.0):
+	#Indices and frame of an n x n vertex grid in the xy plane, two triangles per cell
+	vertices = array.array("f")
+	for y in range(n):
+		for x in range(n):
+			vertices.extend((float(x), float(y), z))
+	indices = array.array("I")
+	for y in range(n - 1):
+		for x in range(n - 1):
+			a = y * n + x
+			indices.extend((a, a + 1, a + n + 1, a, a + n + 1, a + n))
+	return indices, vertices
+
+def newwriter(indices, vertexcount, framecount=1, name="mesh", textured=False):
+	uvlist = [(0.5, 0.5)] * vertexcount if textured else []
+	return g3d.G3DMeshWriter(name, framecount, vertexcount, indices, [], uvlist, (1.0, 1.0, 1.0), (0.9, 0.9, 0.9),
+		9.999999, 1.0, 0, 1 if textured else 0, ["mesh.png"] if textured else [])
+
+def normals(vertexcount):
+	return array.array("f", [0.0, 0.0, 1.0]) * vertexcount
+
+def save(path, writers, version=4):
+	with open(path, "wb") as fileID:
+		ranges = g3d.writemodel(fileID, writers, version)
+	for writer in writers:
+		writer.close()
+	return ranges
+
+def triangles(indices):
+	#Triangles as rotation independent tuples, for comparing reordered index buffers
+	result = []
+	for i in range(0, len(indices), 3):
+		tri = list(indices[i:i + 3])
+		turn = tri.index(min(tri))
+		result.append(tuple(tri[turn:] + tri[:turn]))
+	return sorted(result)
+
+###########################################################################
+# Encoding and decoding
+###########################################################################
+@pytest.mark.parametrize("version", [3, 4, 5])
+@pytest.mark.parametrize("textured", [True, False])
+def test_roundtrip(version, textured):
+	g3d.roundtrip(3000, 4, textured, version)		#raises AssertionError when the data differs
+
+@pytest.mark.parametrize("version", [3, 4, 5])
+def test_writemodel_ranges(tmp_path, version):
+	writers = []
+	for name in ("first", "second"):
+		indices, vertices = grid(4)
+		writer = newwriter(indices, 16, name=name, textured=True)
+		writer.addframe(0, vertices, normals(16))
+		writers.append(writer)
+	path = str(tmp_path / "model.g3d")
+	ranges = save(path, writers, version)
+	with g3d.G3DFile(path) as g3dfile:
+		assert g3dfile.header.version == version
+		assert [entry.end for entry in g3dfile.meshes] == [end for start, end in ranges]
+		assert ranges[1][0] == ranges[0][1]
+		data = g3dfile.meshdata(1)
+		assert list(data.indexdata) == list(indices)
+		assert data.vertexframe(0).tolist() == vertices.tolist()
+		data = None
+
+def test_stream_matches_file(tmp_path):
+	indices, vertices = grid(5)
+	writer = newwriter(indices, 25, framecount=2)
+	writer.addframe(0, vertices, normals(25))
+	writer.addframe(1, array.array("f", [v + 1.0 for v in vertices]), normals(25))
+	path = str(tmp_path / "model.g3d")
+	save(path, [writer])
+	with open(path, "rb") as f:
+		content = f.read()
+	with g3d.G3DFile(path) as fromfile, g3d.G3DFile(io.BytesIO(content), "model.g3d") as fromstream:
+		assert fromstream.filepath == "model.g3d"
+		assert fromstream.meshes[0].meshname == fromfile.meshes[0].meshname
+		assert fromstream.meshdata(0).vertexdata.tobytes() == fromfile.meshdata(0).vertexdata.tobytes()
+
+def test_empty_stream():
+	with pytest.raises(EOFError):
+		g3d.G3DFile(io.BytesIO(b""))
+
+def test_buffer():
+	buffer = g3d.G3DBuffer(b"abcdef")
+	assert buffer.read(2) == b"ab"
+	assert bytes(buffer.view(2)) == b"cd"
+	assert buffer.tell() == 4
+	buffer.seek(-1, 2)
+	assert buffer.read() == b"f"
+	assert len(buffer) == 6
+
+###########################################################################
+# Bounds and keyframes
+###########################################################################
+def test_bounds_only_in_v5(tmp_path):
+	def write(version, bounds):
+		indices, vertices = grid(3)
+		writer = newwriter(indices, 9, framecount=2)
+		writer.bounds = bounds
+		writer.addframe(0, vertices, normals(9))
+		writer.addframe(1, array.array("f", [v * 2.0 for v in vertices]), normals(9))
+		path = str(tmp_path / ("v%d_%d.g3d" % (version, bounds)))
+		save(path, [writer], version)
+		return path
+	with open(write(4, True), "rb") as a, open(write(4, False), "rb") as b:
+		assert a.read() == b.read()				#the V4 layout doesn't change
+	with g3d.G3DFile(write(5, True)) as g3dfile:
+		header = g3dfile.meshes[0].header
+		assert header.bounds.boxmin == pytest.approx((0.0, 0.0, 0.0))
+		assert header.bounds.boxmax == pytest.approx((4.0, 4.0, 0.0))
+		assert [bounds.boxmax[0] for bounds in header.framebounds] == pytest.approx([2.0, 4.0])
+
+def test_boundsof_enclose():
+	a = g3d.boundsof(array.array("f", [0.0, 0.0, 0.0, 2.0, 0.0, 0.0]))
+	b = g3d.boundsof(array.array("f", [4.0, 0.0, 0.0, 6.0, 0.0, 0.0]))
+	assert a.center == pytest.approx((1.0, 0.0, 0.0)) and a.radius == pytest.approx(1.0)
+	both = g3d.enclose([a, b])
+	assert both.boxmin[0] == 0.0 and both.boxmax[0] == 6.0
+	assert both.radius >= 3.0
+
+def test_reducekeys(tmp_path):
+	#linear motion to frame 8, another slope to frame 14, then standing still
+	indices, vertices = grid(3)
+	positions = [0.0]
+	for frame in range(1, 20):
+		positions.append(positions[-1] + (1.0 if frame <= 8 else 0.5 if frame <= 14 else 0.0))
+	writer = newwriter(indices, 9, framecount=20)
+	for frame, offset in enumerate(positions):
+		writer.addframe(frame, array.array("f", [v + offset for v in vertices]), normals(9))
+	assert writer.reducekeys(0.001) == 4
+	path = str(tmp_path / "keys.g3d")
+	save(path, [writer], 5)
+	with g3d.G3DFile(path) as g3dfile:
+		header = g3dfile.meshes[0].header
+		assert list(g3d.keyframes(header)) == [0, 8, 14, 19]
+		data = g3dfile.meshdata(0)
+		assert data.vertexframe(2)[0] == pytest.approx(positions[14], abs=0.01)
+		data = None
+
+def test_keyframes_without_chunk(tmp_path):
+	indices, vertices = grid(2)
+	writer = newwriter(indices, 4, framecount=3)
+	for frame in range(3):
+		writer.addframe(frame, vertices, normals(4))
+	path = str(tmp_path / "plain.g3d")
+	save(path, [writer])
+	with g3d.G3DFile(path) as g3dfile:
+		assert list(g3d.keyframes(g3dfile.meshes[0].header)) == [0, 1, 2]
+
+###########################################################################
+# Vertex cache optimisation and level of detail
+###########################################################################
+def test_tipsify_keeps_triangles():
+	indices, vertices = grid(30)
+	reordered = g3d.tipsify(indices, 900)
+	assert triangles(reordered) == triangles(indices)
+	assert g3d.cachestats(reordered, 900)[0] <= g3d.cachestats(indices, 900)[0]
+
+def test_firstuse_permute():
+	order = g3d.firstuse(array.array("I", [2, 0, 2]), 4)
+	assert list(order) == [2, 0, 1, 3]
+	block = array.array("f", range(12))
+	assert list(g3d.permute(block, order)) == [6, 7, 8, 0, 1, 2, 3, 4, 5, 9, 10, 11]
+	assert list(g3d.permute(block, [3])) == [9, 10, 11]
+
+def test_optimize_remaps_frames(tmp_path):
+	indices, vertices = grid(6)
+	writer = newwriter(indices, 36)
+	writer.optimize()
+	writer.addframe(0, vertices, normals(36))
+	path = str(tmp_path / "optimized.g3d")
+	save(path, [writer])
+	with g3d.G3DFile(path) as g3dfile:
+		data = g3dfile.meshdata(0)
+		frame = data.vertexframe(0)
+		found = [tuple(frame[i * 3:i * 3 + 3]) for i in data.indexdata]
+		data = None
+	assert sorted(found) == sorted(tuple(vertices[i * 3:i * 3 + 3]) for i in indices)
+
+def test_simplify_flat_grid():
+	indices, vertices = grid(10)
+	result, error = g3d.simplify(indices, [vertices.tolist()], 100, 40)
+	assert len(result) // 3 == 40
+	assert error == pytest.approx(0.0, abs=1e-6)			#the grid is flat, no collapse moves it
+	border = set(v for v in range(100) if v % 10 in (0, 9) or v // 10 in (0, 9))
+	assert border <= set(result)
+
+def test_simplified_writer():
+	indices, vertices = grid(8)
+	writer = newwriter(indices, 64, framecount=2)
+	writer.addframe(0, vertices, normals(64))
+	writer.addframe(1, vertices, normals(64))
+	lod = writer.simplified(0.5)
+	try:
+		assert lod.lod["triangles"] < len(indices) // 3
+		assert lod.vertexCount == len(set(lod.indices))
+		assert lod.frameCount == 2
+	finally:
+		lod.close()
+		writer.close()
+
+def test_simplified_checks_last_frame():
+	#In the last of 3 frames the ring around the centre of a 3 x 3 grid is bent so that moving the centre
+	#onto any neighbour flips a triangle, while every triangle still faces up. The only collapse is rejected
+	indices, vertices = grid(3)
+	last = array.array("f", vertices)
+	for v, (x, y) in ((5, (2.0, 3.0)), (7, (2.0, 1.5)), (8, (0.0, 0.25))):
+		last[v * 3:v * 3 + 2] = array.array("f", (x, y))
+	assert all(g3d._normal(last, *indices[i:i + 3])[2] > 0.0 for i in range(0, len(indices), 3))
+	writer = newwriter(indices, 9, framecount=3)
+	for frame, positions in enumerate((vertices, vertices, last)):
+		writer.addframe(frame, array.array("f", positions), normals(9))
+	lod = writer.simplified(0.1)
+	try:
+		assert lod.lod["triangles"] == len(indices) // 3
+	finally:
+		lod.close()
+		writer.close()
+
+###########################################################################
+# Welding
+###########################################################################
+def test_weld(tmp_path):
+	#two triangles with a shared edge stored as separate vertices
+	vertices = array.array("f", [0, 0, 0, 1, 0, 0, 0, 1, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0])
+	indices = array.array("I", [0, 1, 2, 3, 4, 5])
+	writer = newwriter(indices, 6)
+	writer.addframe(0, vertices, normals(6))
+	path = str(tmp_path / "weld.g3d")
+	save(path, [writer])
+	with g3d.G3DFile(path) as g3dfile:
+		data = g3dfile.meshdata(0)
+		remap, keep = g3d.weld(data)
+		data = None
+	assert list(keep) == [0, 1, 2, 4]
+	assert list(remap) == [0, 1, 2, 1, 3, 2]
+	welded, kept = g3d.weldindices(indices, remap)
+	assert list(welded) == [0, 1, 2, 1, 3, 2]
+	assert list(kept) == [0, 1, 2, 3, 4, 5]
+
+def test_weldindices_drops_collapsed():
+	welded, kept = g3d.weldindices(array.array("I", [0, 1, 2, 0, 1, 3]), array.array("I", [0, 1, 2, 1]))
+	assert list(welded) == [0, 1, 2]
+	assert list(kept) == [0, 1, 2]
+
+###########################################################################
+# Texture atlas
+###########################################################################
+def test_packatlas():
+	sizes = [(256, 256), (128, 64), (64, 128), (512, 256), (32, 32)]
+	width, height, positions = g3d.packatlas(sizes, padding=4)
+	assert width & (width - 1) == 0 and height & (height - 1) == 0
+	rects = [(x - 4, y - 4, x + w + 4, y + h + 4) for (x, y), (w, h) in zip(positions, sizes)]
+	for x0, y0, x1, y1 in rects:
+		assert x0 >= 0 and y0 >= 0 and x1 <= width and y1 <= height
+	for i, a in enumerate(rects):
+		for b in rects[i + 1:]:
+			assert a[2] <= b[0] or b[2] <= a[0] or a[3] <= b[1] or b[3] <= a[1]
+
+def test_packatlas_too_large():
+	assert g3d.packatlas([(8192, 8192), (8192, 8192)], padding=4) is None
+	assert g3d.packatlas([]) is None
+
+def test_atlasuv():
+	uv = g3d.atlasuv([(0.0, 0.0), (1.0, 1.0)], (64, 32, 64, 32), (256, 128))
+	assert uv == [(0.25, 0.25), (0.5, 0.5)]
+
+def test_blit_padding():
+	atlas = array.array("f", [0.0]) * (4 * 4)
+	g3d.blit(atlas, 4, array.array("f", [1.0, 2.0, 3.0, 4.0]), 2, 2, 1, 1, padding=1, channels=1)
+	assert list(atlas) == [1, 1, 2, 2,
+		1, 1, 2, 2,
+		3, 3, 4, 4,
+		3, 3, 4, 4]
+
+###########################################################################
+# Merging
+###########################################################################
+def test_mergewriters(tmp_path):
+	writers = []
+	for offset in (0.0, 10.0):
+		indices, vertices = grid(3)
+		writer = newwriter(indices, 9, framecount=2, name="part%d" % offset)
+		for frame in range(2):
+			writer.addframe(frame, array.array("f", [v + offset + frame for v in vertices]), normals(9))
+		writers.append(writer)
+	assert g3d.mergekey(writers[0]) == g3d.mergekey(writers[1])
+	merged = g3d.mergewriters(writers, "merged")
+	for writer in writers:
+		writer.close()
+	assert merged.vertexCount == 18
+	assert list(merged.indices[len(indices):len(indices) + 3]) == [i + 9 for i in indices[:3]]
+	path = str(tmp_path / "merged.g3d")
+	save(path, [merged])
+	with g3d.G3DFile(path) as g3dfile:
+		assert len(g3dfile.meshes) == 1
+		frame = g3dfile.meshdata(0).vertexframe(1)
+		assert frame[0] == 1.0 and frame[27] == 11.0
+
+###########################################################################
+# Scanner
+###########################################################################
+def test_scan_clean(tmp_path):
+	path = str(tmp_path / "clean.g3d")
+	indices, vertices = grid(4)
+	writer = newwriter(indices, 16)
+	writer.addframe(0, vertices, normals(16))
+	save(path, [writer])
+	result = g3d.scanfile(path)
+	assert result["problems"] == []
+	assert (result["meshes"], result["vertices"], result["triangles"]) == (1, 16, 18)
+
+def test_scan_problems(tmp_path):
+	path = str(tmp_path / "model.g3d")
+	indices, vertices = grid(4)
+	writer = newwriter(indices, 16)
+	writer.addframe(0, vertices, normals(16))
+	save(path, [writer])
+	with open(path, "rb") as f:
+		content = f.read()
+	trailing = str(tmp_path / "trailing.g3d")
+	with open(trailing, "wb") as f:
+		f.write(content + b"\0" * 8)
+	assert any("trailing data" in problem for problem in g3d.scanfile(trailing)["problems"])
+	truncated = str(tmp_path / "truncated.g3d")
+	with open(truncated, "wb") as f:
+		f.write(content[:-8])
+	assert any("truncated" in problem for problem in g3d.scanfile(truncated)["problems"])
+	wrongcount = str(tmp_path / "wrongcount.g3d")
+	with open(wrongcount, "wb") as f:
+		f.write(content[:4] + struct.pack("<H", 0) + content[6:])
+	assert any("trailing data after 0 meshes" in problem for problem in g3d.scanfile(wrongcount)["problems"])
+	assert g3d.scanfile(str(tmp_path / "missing.g3d"))["problems"]
+
+def test_truncated_file_closed(tmp_path):
+	path = str(tmp_path / "model.g3d")
+	indices, vertices = grid(4)
+	writer = newwriter(indices, 16)
+	writer.addframe(0, vertices, normals(16))
+	save(path, [writer])
+	with open(path, "rb") as f:
+		content = f.read()
+	with open(path, "wb") as f:
+		f.write(content[:-8])
+	with warnings.catch_warnings(record=True) as caught:
+		warnings.simplefilter("always", ResourceWarning)
+		with pytest.raises(EOFError):
+			g3d.G3DFile(path)
+		gc.collect()
+	assert not [warning for warning in caught if issubclass(warning.category, ResourceWarning)]
+
+def test_findfiles(tmp_path):
+	(tmp_path / "units").mkdir()
+	for name in ("units/a.g3d", "units/b.G3D", "units/c.png"):
+		(tmp_path / name).write_bytes(b"")
+	found = [os.path.basename(path) for path in g3d.findfiles([str(tmp_path)])]
+	assert sorted(found, key=str.lower) == ["a.g3d", "b.G3D"]
+
+###########################################################################
+# Benchmarks
+###########################################################################
+BENCHFRAMES = 2
+
+def rawsize(vertexcount):
+	#Bytes of the decoded synthetic mesh, vertices and normals of every frame, texcoords and indices
+	return vertexcount * (BENCHFRAMES * 24 + 8) + (vertexcount - vertexcount % 3) * 4
+
+def throughput(benchmark, vertexcount):
+	benchmark.extra_info["bytes"] = rawsize(vertexcount)
+	benchmark.extra_info["bytes_per_second"] = rawsize(vertexcount) / benchmark.stats.stats.mean
+
+@benchmarked
+@pytest.mark.parametrize("version", [3, 4, 5])
+@pytest.mark.parametrize("vertexcount", [1000, 100000, 1000000])
+def test_bench_encode(benchmark, vertexcount, version):
+	def setup():
+		writer, frames = g3d.syntheticmesh(vertexcount, BENCHFRAMES)
+		return (writer, frames), {}
+	def encode(writer, frames):
+		for frame, (vertices, normals) in enumerate(frames):
+			writer.addframe(frame, vertices, normals)
+		g3d.writemodel(io.BytesIO(), [writer], version)
+		writer.close()
+	benchmark.pedantic(encode, setup=setup, rounds=3, warmup_rounds=1)
+	throughput(benchmark, vertexcount)
+
+@benchmarked
+@pytest.mark.parametrize("version", [3, 4, 5])
+@pytest.mark.parametrize("vertexcount", [1000, 100000, 1000000])
+def test_bench_decode(benchmark, tmp_path, vertexcount, version):
+	writer, frames = g3d.syntheticmesh(vertexcount, BENCHFRAMES)
+	for frame, (vertices, normals) in enumerate(frames):
+		writer.addframe(frame, vertices, normals)
+	path = str(tmp_path / "bench.g3d")
+	save(path, [writer], version)
+	def decode():
+		with g3d.G3DFile(path) as g3dfile:
+			data = g3dfile.meshdata(0)
+			blocks = [data.vertexdata.tobytes(), data.normaldata.tobytes(), data.texcoorddata.tobytes(), data.indexdata.tobytes()]
+			data = None
+		return blocks
+	benchmark.pedantic(decode, rounds=3, warmup_rounds=1)
+	throughput(benchmark, vertexcount)
+
+@benchmarked
+def test_bench_tipsify(benchmark):
+	indices, vertices = grid(100)
+	benchmark(g3d.tipsify, indices, 10000)
+
+@benchmarked
+def test_bench_reducekeys(benchmark):
+	indices, vertices = grid(40)
+	def reduce():
+		writer = newwriter(indices, 1600, framecount=30)
+		for frame in range(30):
+			writer.addframe(frame, array.array("f", [v + frame * 0.1 for v in vertices]), normals(1600))
+		writer.reducekeys(0.001)
+		writer.close()
+	benchmark(reduce)